@@ -0,0 +1,89 @@
+import numpy as np
+
+from avp_env.common import Trajectory
+from avp_env.envs.avp_env import LAST_POSITION
+
+# Chance of a uniformly random action instead of the optimal one, per RulebasedAgent mode
+NOISE_PROBABILITIES = {
+    "Optimal": 0.0,
+    "Good": 0.1,
+    "Normal": 0.5,
+    "Random": 1.0,
+}
+
+NUM_ACTIONS = 7
+
+
+class ExpertTransitionGenerator:
+    """Build RulebasedAgent transitions for many episodes at once, without stepping an env.
+
+    Every episode follows get_perfect_trajectory with the agent's noise, ends on the first parking action
+    (or the last position) and is truncated after len(perfect_trajectory) steps, exactly as
+    collect_data_for_supervised_learning plays it. As in that loop, the first step of an episode is not
+    recorded. Like the env, the observed frame is the one at the start position, since moving forward
+    does not refresh it; current_frame=True uses the frame of the current position instead.
+    """
+
+    def __init__(self, image_store, trajectories, tokens, seed=None):
+        self.image_store = image_store
+        self.tokens = np.asarray(tokens)
+        self.rng = np.random.default_rng(seed)
+
+        scans = np.array([image_store.scan_index[trajectory.scan] for trajectory in trajectories], dtype=np.int64)
+        self.image_rows = image_store.row_table[scans]
+        # Without a target the perfect trajectory drives forward through the whole path
+        self.lengths = Trajectory.column(trajectories, "path_id", LAST_POSITION, np.int64)
+        self.loc_ids = Trajectory.column(trajectories, "loc_id", 0, np.int64)
+        self.num_trajectories = len(trajectories)
+
+    @classmethod
+    def from_env(cls, env, seed=None):
+        return cls(env.image_data, env.trajectories, env.instruction_tokens.tokens, seed)
+
+    def actions(self, trajectory_rows, mode="Optimal"):
+        """(episodes, max_length) actions the agent takes, -1 past the end of each perfect trajectory."""
+        lengths = self.lengths[trajectory_rows]
+        steps = np.arange(lengths.max(initial=0))
+        actions = np.where(steps == lengths[:, None] - 1, self.loc_ids[trajectory_rows][:, None], 0)
+
+        noise = NOISE_PROBABILITIES[mode]
+        if noise > 0:
+            random_steps = self.rng.random(actions.shape) < noise
+            actions[random_steps] = self.rng.integers(NUM_ACTIONS, size=int(random_steps.sum()))
+        actions[steps >= lengths[:, None]] = -1
+        return actions
+
+    def transitions(self, trajectory_rows=None, mode="Optimal", current_frame=False):
+        """Recorded transitions as (image_rows, trajectory_rows, actions), one entry per sample.
+
+        trajectory_rows defaults to one episode per instruction; repeat it for more episodes.
+        """
+        if trajectory_rows is None:
+            trajectory_rows = np.arange(self.num_trajectories)
+        trajectory_rows = np.asarray(trajectory_rows, dtype=np.int64)
+        actions = self.actions(trajectory_rows, mode)
+
+        # An episode runs up to and including its first parking action, within its trajectory length
+        stops = actions > 0
+        first_stop = np.where(stops.any(axis=1), stops.argmax(axis=1), actions.shape[1])
+        num_steps = np.minimum(first_stop + 1, self.lengths[trajectory_rows])
+
+        steps = np.arange(actions.shape[1])
+        recorded = (steps >= 1) & (steps < num_steps[:, None])
+        episode, step = np.nonzero(recorded)
+
+        sample_trajectories = trajectory_rows[episode]
+        positions = step + 1 if current_frame else np.ones_like(step)
+        image_rows = self.image_rows[sample_trajectories, positions]
+        if np.any(image_rows < 0):
+            raise KeyError("Some recorded positions have no image")
+        return image_rows, sample_trajectories, actions[episode, step]
+
+    def generate(self, trajectory_rows=None, mode="Optimal", current_frame=False):
+        """Recorded transitions as the (images, instructions, actions) tensors of the supervised dataset."""
+        image_rows, sample_trajectories, actions = self.transitions(trajectory_rows, mode, current_frame)
+        return self.image_store.take(image_rows), self.tokens[sample_trajectories], actions
+
+    def sample_trajectories(self, num_episodes):
+        """Uniformly drawn target trajectories, like successive AutonomousParkingEnv.reset calls."""
+        return self.rng.integers(self.num_trajectories, size=num_episodes)
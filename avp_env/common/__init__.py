@@ -1,9 +1,19 @@
+from avp_env.common.record import Record
 from avp_env.common.trajectory import Trajectory
 from avp_env.common.instructions import Instruction
-from avp_env.common.parking_area import ParkingSlot
+from avp_env.common.parking_area import ParkingSlot, ParkingSlotIndex
+from avp_env.common.slot_table import SlotTable, TagVocabulary
+from avp_env.common.reward import RewardEngine
+from avp_env.common.tag_index import TagIndex
 
 __all__ = [
+    "Record",
     "Trajectory",
     "Instruction",
-    "ParkingSlot"
+    "ParkingSlot",
+    "ParkingSlotIndex",
+    "SlotTable",
+    "TagVocabulary",
+    "RewardEngine",
+    "TagIndex"
 ]
@@ -1,4 +1,9 @@
-class Instruction:
+from avp_env.common.record import Record
+
+
+class Instruction(Record):
+    __slots__ = ('instruction', 'tags')
+
     def __init__(self, data):
         self.instruction = data["instruction"]
         self.tags = data["tags"]
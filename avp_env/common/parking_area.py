@@ -1,4 +1,12 @@
-class ParkingSlot:
+import numpy as np
+
+from avp_env.common.record import Record
+
+
+class ParkingSlot(Record):
+    __slots__ = ('ParkingID', 'NextWall', 'SideRoad', 'NearExit', 'Sunlight', 'Column', 'NextDriveWay',
+                 'Charging', 'Disabled', 'Occupied', 'Around', 'PathID', 'LocID')
+
     def __init__(self, data):
         self.ParkingID = data["ParkingID"]
         self.NextWall = data["NextWall"]
@@ -13,3 +21,65 @@ class ParkingSlot:
         self.Around = data["Around"]
         self.PathID = data["PathID"]
         self.LocID = data["LocID"]
+
+
+class ParkingSlotIndex:
+    """Constant-time slot lookup by (PathID, LocID) or ParkingID, optionally restricted to one scan."""
+
+    def __init__(self, scans, slots):
+        # scans[i] is the scan (experiment id) that slots[i] belongs to
+        self.scans = list(scans)
+        self.slots = list(slots)
+        self._by_location = {}
+        self._by_scan_location = {}
+        self._by_id = {}
+        self._by_scan_id = {}
+        self._by_scan = {}
+        self._rows = {id(slot): row for row, slot in enumerate(self.slots)}
+        for scan, slot in zip(self.scans, self.slots):
+            location = (slot.PathID, slot.LocID)
+            self._by_location.setdefault(location, []).append(slot)
+            self._by_scan_location.setdefault((scan,) + location, []).append(slot)
+            self._by_id.setdefault(slot.ParkingID, slot)
+            self._by_scan_id.setdefault((scan, slot.ParkingID), slot)
+            self._by_scan.setdefault(scan, []).append(slot)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def lookup(self, path_id, loc_id, scan=None):
+        """Slots at a location, in ParkingID order; all scans are searched when scan is None."""
+        if scan is None:
+            slots = self._by_location.get((path_id, loc_id))
+        else:
+            slots = self._by_scan_location.get((scan, path_id, loc_id))
+        # Hand out a copy so callers can keep or modify the result freely
+        return list(slots) if slots else []
+
+    def scan_slots(self, scan):
+        """All slots of one scan, in ParkingID order."""
+        return list(self._by_scan.get(scan, []))
+
+    def row(self, slot):
+        """Position of an indexed slot in the slot list (and in a SlotTable built from it)."""
+        return self._rows[id(slot)]
+
+    def row_grid(self, scans, min_path_id=0, min_loc_id=0):
+        """Dense (len(scans), max PathID + 1, max LocID + 1) table of the slot row deciding each location.
+
+        Where several slots share a location the last one (in ParkingID order) is kept, matching how
+        rewards pick from a lookup result; empty locations hold -1.
+        """
+        max_path_id = max([min_path_id] + [slot.PathID for slot in self.slots])
+        max_loc_id = max([min_loc_id] + [slot.LocID for slot in self.slots])
+        grid = np.full((len(scans), max_path_id + 1, max_loc_id + 1), -1, dtype=np.int64)
+        scan_position = {scan: i for i, scan in enumerate(scans)}
+        for row, (scan, slot) in enumerate(zip(self.scans, self.slots)):
+            if scan in scan_position:
+                grid[scan_position[scan], slot.PathID, slot.LocID] = row
+        return grid
+
+    def get(self, parking_id, scan=None):
+        if scan is None:
+            return self._by_id.get(parking_id)
+        return self._by_scan_id.get((scan, parking_id))
@@ -0,0 +1,35 @@
+import numpy as np
+
+
+class Record:
+    """Base of the small data classes loaded from JSON: attributes live in __slots__ instead of a __dict__.
+
+    An attribute that was never assigned raises AttributeError, so hasattr() keeps telling apart records
+    whose JSON lacked a field (e.g. test trajectories without path_id).
+    """
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """Assigned attributes as a dict, in slot order."""
+        return {name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)}
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.to_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+    @classmethod
+    def column(cls, records, name, missing=None, dtype=None):
+        """One attribute of every record as an array; records without it get `missing`."""
+        values = [getattr(record, name, missing) for record in records]
+        if dtype is None and any(not isinstance(value, (bool, int, float, np.number)) for value in values):
+            # Strings, dicts and missing values stay Python objects
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+            return array
+        return np.array(values, dtype=dtype)
+
+    @classmethod
+    def columns(cls, records, names=None, missing=None):
+        """Columnar view of a list of records: {attribute: array}."""
+        return {name: cls.column(records, name, missing) for name in (names or cls.__slots__)}
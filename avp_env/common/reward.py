@@ -0,0 +1,78 @@
+import numpy as np
+
+from avp_env.common.slot_table import MISSING_CODE
+
+
+def _tag_bonus_table(max_tags):
+    # Accumulate 0.2 one tag at a time so the floats match the scalar rule bit for bit
+    bonus = [5]
+    for _ in range(max_tags):
+        bonus.append(bonus[-1] + 0.2)
+    return np.array(bonus, dtype=np.float64)
+
+
+class RewardEngine:
+    """Batched parking rewards for (slot row, trajectory row) pairs over a SlotTable.
+
+    For a parked slot the rules are checked in order:
+      - 10 if it is the target parking slot
+      - -0.5 if it is occupied
+      - -0.2 if its Disabled or Charging tag differs from the instruction
+      - otherwise 5, plus 0.2 for every instruction tag the slot matches
+    Parking where there is no slot (row -1) gives -1, and instructions without a target slot always give 0.
+    """
+
+    def __init__(self, slot_table, trajectories):
+        self.slot_table = slot_table
+        vocabulary = slot_table.vocabulary
+
+        tag_sets = [getattr(trajectory, "tags", None) or {} for trajectory in trajectories]
+        self.tags = sorted({tag for tags in tag_sets for tag in tags})
+        tag_column = {tag: i for i, tag in enumerate(self.tags)}
+
+        n_traj = len(trajectories)
+        self.has_target = np.array([hasattr(trajectory, "ParkingID") for trajectory in trajectories], dtype=bool)
+        self.target_ids = np.full(n_traj, MISSING_CODE, dtype=np.int64)
+        self.target_disabled = np.full(n_traj, MISSING_CODE, dtype=np.int64)
+        self.target_charging = np.full(n_traj, MISSING_CODE, dtype=np.int64)
+        self.target_tags = np.full((n_traj, len(self.tags)), MISSING_CODE, dtype=np.int64)
+        self.target_tag_mask = np.zeros((n_traj, len(self.tags)), dtype=bool)
+        for i, (trajectory, tags) in enumerate(zip(trajectories, tag_sets)):
+            if self.has_target[i]:
+                self.target_ids[i] = vocabulary.code(trajectory.ParkingID)
+            # An instruction without a Disabled / Charging tag never matches those checks
+            if "Disabled" in tags:
+                self.target_disabled[i] = vocabulary.code(tags["Disabled"])
+            if "Charging" in tags:
+                self.target_charging[i] = vocabulary.code(tags["Charging"])
+            for tag, value in tags.items():
+                self.target_tags[i, tag_column[tag]] = vocabulary.code(value)
+                self.target_tag_mask[i, tag_column[tag]] = True
+
+        self.slot_tags = slot_table.columns(self.tags)
+        self.slot_disabled = slot_table.column("Disabled")
+        self.slot_charging = slot_table.column("Charging")
+        self.tag_bonus = _tag_bonus_table(len(self.tags))
+
+    def rewards(self, slot_rows, trajectory_rows):
+        """Rewards for broadcast arrays of slot rows (-1 for no slot) and trajectory rows."""
+        slot_rows = np.asarray(slot_rows, dtype=np.int64)
+        trajectory_rows = np.asarray(trajectory_rows, dtype=np.int64)
+        if slot_rows.shape != trajectory_rows.shape:
+            slot_rows, trajectory_rows = np.broadcast_arrays(slot_rows, trajectory_rows)
+        rewards = np.full(slot_rows.shape, -1.0)
+
+        parked = slot_rows >= 0
+        slots = slot_rows[parked]
+        targets = trajectory_rows[parked]
+        matching_tags = np.count_nonzero(
+            (self.slot_tags[slots] == self.target_tags[targets]) & self.target_tag_mask[targets], axis=-1)
+        wrong_type = (self.slot_disabled[slots] != self.target_disabled[targets]) \
+            | (self.slot_charging[slots] != self.target_charging[targets])
+
+        rewards[parked] = np.where(
+            self.slot_table.parking_ids[slots] == self.target_ids[targets], 10.0,
+            np.where(self.slot_table.occupied[slots], -0.5,
+                     np.where(wrong_type, -0.2, self.tag_bonus[matching_tags])))
+        rewards[~self.has_target[trajectory_rows]] = 0.0
+        return rewards
@@ -0,0 +1,221 @@
+import json
+import os
+import zipfile
+
+import numpy as np
+
+PACK_VERSION = 1
+PACK_NAME = 'scenario_pack.npz'
+COMMANDS_PACK_SUFFIX = '.pack.npz'
+SOURCE_FILES = ('parking_slots.json', 'Traj.json')
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _encode_records(prefix, records):
+    """Columns of a list of JSON objects: int64 where every value is an int, JSON text otherwise."""
+    fields = []
+    for record in records:
+        for field in record:
+            if field not in fields:
+                fields.append(field)
+
+    arrays = {f'{prefix}.count': np.array(len(records)), f'{prefix}.fields': np.array(fields, dtype=str)}
+    for field in fields:
+        present = np.array([field in record for record in records], dtype=bool)
+        values = [record.get(field) for record in records]
+        if not present.all():
+            arrays[f'{prefix}.{field}.present'] = present
+        if all(type(value) is int for value, has in zip(values, present) if has):
+            arrays[f'{prefix}.{field}'] = np.array([value if has else 0 for value, has in zip(values, present)],
+                                                   dtype=np.int64)
+        else:
+            arrays[f'{prefix}.{field}.json'] = np.array([json.dumps(value) for value in values], dtype=str)
+    return arrays
+
+
+def _decode_records(pack, prefix):
+    count = int(pack[f'{prefix}.count'])
+    records = [{} for _ in range(count)]
+    for field in pack[f'{prefix}.fields'].tolist():
+        present_key = f'{prefix}.{field}.present'
+        present = pack[present_key].tolist() if present_key in pack else [True] * count
+        if f'{prefix}.{field}' in pack:
+            values = pack[f'{prefix}.{field}'].tolist()
+        else:
+            values = [json.loads(value) for value in pack[f'{prefix}.{field}.json'].tolist()]
+        for record, value, has in zip(records, values, present):
+            if has:
+                record[field] = value
+    return records
+
+
+def pack_path(experiment_path):
+    return os.path.join(experiment_path, PACK_NAME)
+
+
+def commands_pack_path(commands_path):
+    return os.path.splitext(commands_path)[0] + COMMANDS_PACK_SUFFIX
+
+
+def _save_pack(path, arrays):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def compile_scenario(experiment_path, token_table=None):
+    """Compile a Vision scenario directory into one versioned .npz pack next to its JSON files.
+
+    The pack holds columnar slot and trajectory tables, the sorted frame listing and, when a token table
+    built from this scenario's instructions is given, its pre-tokenized rows.
+    """
+    with open(os.path.join(experiment_path, 'parking_slots.json'), 'r') as f:
+        parking_slots = json.load(f)
+    with open(os.path.join(experiment_path, 'Traj.json'), 'r') as f:
+        trajectories = json.load(f)
+
+    arrays = {'version': np.array(PACK_VERSION)}
+    arrays.update(_encode_records('slots', parking_slots))
+    arrays.update(_encode_records('trajectories', trajectories))
+    arrays['images.files'] = np.array(
+        sorted(filename for filename in os.listdir(experiment_path) if filename.endswith('.JPG')), dtype=str)
+
+    sources = {filename: _file_signature(os.path.join(experiment_path, filename)) for filename in SOURCE_FILES}
+    arrays['sources'] = np.array(json.dumps(sources))
+
+    if token_table is not None:
+        if token_table.instructions != [trajectory['instruction'] for trajectory in trajectories]:
+            raise ValueError("The token table was not built from this scenario's instructions")
+        arrays['tokens'] = np.asarray(token_table.tokens)
+        arrays['tokens.key'] = np.array(json.dumps([token_table.tokenizer_name, token_table.max_string_length]))
+
+    path = pack_path(experiment_path)
+    _save_pack(path, arrays)
+    # Give the pack the directory's mtime: adding or removing a frame later makes the directory newer
+    directory_mtime = os.stat(experiment_path).st_mtime_ns
+    os.utime(path, ns=(directory_mtime, directory_mtime))
+    return path
+
+
+class ScenarioPack:
+    """Read side of a compiled scenario; every accessor returns what the JSON files would give."""
+
+    def __init__(self, path, arrays, sources, mtime_ns):
+        self.path = path
+        self.arrays = arrays
+        self.sources = sources
+        self.mtime_ns = mtime_ns
+        self._parking_slots = None
+        self._trajectories = None
+
+    def parking_slots(self):
+        if self._parking_slots is None:
+            self._parking_slots = _decode_records(self.arrays, 'slots')
+        return self._parking_slots
+
+    def trajectories(self):
+        if self._trajectories is None:
+            self._trajectories = _decode_records(self.arrays, 'trajectories')
+        return self._trajectories
+
+    def image_files(self):
+        """Sorted frame filenames, or None when frames were added or removed since compiling."""
+        if os.stat(os.path.dirname(self.path)).st_mtime_ns > self.mtime_ns:
+            return None
+        return self.arrays['images.files'].tolist()
+
+    def tokens(self, tokenizer_name, max_string_length):
+        """Pre-tokenized instructions, or None when the pack was compiled without them or with another tokenizer."""
+        if 'tokens' not in self.arrays:
+            return None
+        if json.loads(str(self.arrays['tokens.key'])) != [tokenizer_name, max_string_length]:
+            return None
+        return self.arrays['tokens']
+
+
+_packs = {}
+
+
+def _sources_unchanged(experiment_path, sources, filenames=SOURCE_FILES):
+    for filename in filenames:
+        source_path = os.path.join(experiment_path, filename)
+        if not os.path.exists(source_path) or _file_signature(source_path) != sources.get(filename):
+            return False
+    return True
+
+
+def load_pack(experiment_path):
+    """The scenario's pack, or None when it is missing, of another version or older than its JSON files."""
+    path = pack_path(experiment_path)
+    try:
+        signature = tuple(_file_signature(path))
+    except OSError:
+        return None
+    cached = _packs.get(path)
+    if cached is not None and cached[0] == signature:
+        # The JSON files may have been edited since the pack was first read
+        return cached[1] if _sources_unchanged(experiment_path, cached[1].sources) else None
+
+    try:
+        with np.load(path) as pack:
+            if 'version' not in pack or int(pack['version']) != PACK_VERSION:
+                return None
+            arrays = dict(pack)
+    except (OSError, ValueError, zipfile.BadZipFile):
+        # An unreadable pack is ignored like a missing one, the JSON files are still there
+        return None
+    sources = json.loads(str(arrays['sources']))
+    if not _sources_unchanged(experiment_path, sources):
+        return None
+
+    pack = ScenarioPack(path, arrays, sources, signature[0])
+    _packs[path] = (signature, pack)
+    return pack
+
+
+def compile_commands(commands_path):
+    """Compile a commands file such as ../data/commands/test_command.json into a pack next to it."""
+    with open(commands_path, 'r') as f:
+        commands = json.load(f)
+
+    arrays = {'version': np.array(PACK_VERSION)}
+    arrays.update(_encode_records('commands', commands))
+    filename = os.path.basename(commands_path)
+    arrays['sources'] = np.array(json.dumps({filename: _file_signature(commands_path)}))
+
+    path = commands_pack_path(commands_path)
+    _save_pack(path, arrays)
+    return path
+
+
+def load_commands(commands_path):
+    """The records of a compiled commands file, or None when its pack is missing, stale or unreadable."""
+    path = commands_pack_path(commands_path)
+    directory, filename = os.path.split(commands_path)
+    try:
+        signature = tuple(_file_signature(path))
+    except OSError:
+        return None
+    cached = _packs.get(path)
+    if cached is not None and cached[0] == signature:
+        sources, commands = cached[1]
+        return commands if _sources_unchanged(directory, sources, (filename,)) else None
+
+    try:
+        with np.load(path) as pack:
+            if 'version' not in pack or int(pack['version']) != PACK_VERSION:
+                return None
+            arrays = dict(pack)
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+    sources = json.loads(str(arrays['sources']))
+    if not _sources_unchanged(directory, sources, (filename,)):
+        return None
+
+    commands = _decode_records(arrays, 'commands')
+    _packs[path] = (signature, (sources, commands))
+    return commands
@@ -0,0 +1,70 @@
+import numpy as np
+
+# Attributes of a ParkingSlot that instructions can ask for
+SLOT_TAGS = (
+    "NextWall", "SideRoad", "NearExit", "Sunlight", "Column",
+    "NextDriveWay", "Charging", "Disabled", "Occupied", "Around",
+)
+
+# Code that never matches any encoded value, e.g. for a tag an instruction does not specify
+MISSING_CODE = -1
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return "list", tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return "dict", tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    return value
+
+
+class TagVocabulary:
+    """Maps tag values to integer codes so that codes are equal exactly when the values compare equal."""
+
+    def __init__(self):
+        self._codes = {}
+
+    def __len__(self):
+        return len(self._codes)
+
+    def code(self, value):
+        # Plain hashable scalars skip the conversion; lists and dicts fall through to it
+        try:
+            return self._codes[value]
+        except (KeyError, TypeError):
+            return self._codes.setdefault(_hashable(value), len(self._codes))
+
+    def encode(self, values):
+        return np.fromiter((self.code(value) for value in values), dtype=np.int64)
+
+
+class SlotTable:
+    """Struct-of-arrays view of parking slots: one NumPy column of value codes per attribute."""
+
+    def __init__(self, slots, vocabulary=None):
+        self.slots = list(slots)
+        self.vocabulary = vocabulary if vocabulary is not None else TagVocabulary()
+        self.parking_ids = self.vocabulary.encode(slot.ParkingID for slot in self.slots)
+        self.path_ids = np.array([slot.PathID for slot in self.slots], dtype=np.int64)
+        self.loc_ids = np.array([slot.LocID for slot in self.slots], dtype=np.int64)
+        self.occupied = np.array([slot.Occupied != 0 for slot in self.slots], dtype=bool)
+        self._columns = {}
+        for tag in SLOT_TAGS:
+            self.column(tag)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def column(self, tag):
+        """Codes of a tag for every slot; slots without the attribute hold the code of None."""
+        codes = self._columns.get(tag)
+        if codes is None:
+            codes = self.vocabulary.encode(getattr(slot, tag, None) for slot in self.slots)
+            self._columns[tag] = codes
+        return codes
+
+    def columns(self, tags):
+        """(n_slots, len(tags)) code matrix for a list of tags."""
+        if not tags:
+            return np.zeros((len(self.slots), 0), dtype=np.int64)
+        return np.stack([self.column(tag) for tag in tags], axis=1)
@@ -0,0 +1,58 @@
+import numpy as np
+
+from avp_env.common.slot_table import _hashable
+
+
+def _slot_value(slot, tag):
+    # Works for raw parking_slots.json entries as well as ParkingSlot objects
+    if isinstance(slot, dict):
+        return slot.get(tag)
+    return getattr(slot, tag, None)
+
+
+class TagIndex:
+    """Inverted index from (tag, value) to a boolean mask over slots, with memoized tag combinations."""
+
+    def __init__(self, slots):
+        self.slots = list(slots)
+        self._postings = {}
+        self._memo = {}
+        self._empty = np.zeros(len(self.slots), dtype=bool)
+        self._empty.flags.writeable = False
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _tag_postings(self, tag):
+        postings = self._postings.get(tag)
+        if postings is None:
+            postings = {}
+            for row, slot in enumerate(self.slots):
+                key = _hashable(_slot_value(slot, tag))
+                if key not in postings:
+                    postings[key] = np.zeros(len(self.slots), dtype=bool)
+                postings[key][row] = True
+            for mask in postings.values():
+                mask.flags.writeable = False
+            self._postings[tag] = postings
+        return postings
+
+    def mask(self, tags):
+        """Slots whose every tag equals the requested value; an empty tag set matches nothing."""
+        if not tags:
+            return self._empty
+        key = tuple(sorted((tag, _hashable(value)) for tag, value in tags.items()))
+        mask = self._memo.get(key)
+        if mask is None:
+            mask = np.logical_and.reduce(
+                [self._tag_postings(tag).get(value, self._empty) for tag, value in key])
+            mask.flags.writeable = False
+            self._memo[key] = mask
+        return mask
+
+    def rows(self, tags):
+        return np.flatnonzero(self.mask(tags))
+
+    def match(self, tags):
+        """Matching slots, in their original order."""
+        return [self.slots[row] for row in self.rows(tags)]
@@ -1,4 +1,10 @@
-class Trajectory:
+from avp_env.common.record import Record
+
+
+class Trajectory(Record):
+    # Test trajectories only have scan and instruction; the other slots stay unset
+    __slots__ = ('scan', 'path_id', 'instruction', 'tags', 'ParkingID', 'loc_id')
+
     def __init__(self, data):
         if "path_id" in data:
             self.scan = data["scan"]
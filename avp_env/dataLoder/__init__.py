@@ -1,8 +1,17 @@
 from avp_env.dataLoder.loader import DataReader
 from avp_env.dataLoder.image import ImageLoader
+from avp_env.dataLoder.store import ImageStore, ShardedImageStore
+from avp_env.dataLoder.tokens import InstructionTokenTable
+from avp_env.dataLoder.assets import EnvAssets, get_assets, clear_assets
 
 
 __all__ = [
     "DataReader",
-    "ImageLoader"
+    "ImageLoader",
+    "ImageStore",
+    "ShardedImageStore",
+    "InstructionTokenTable",
+    "EnvAssets",
+    "get_assets",
+    "clear_assets"
 ]
@@ -0,0 +1,74 @@
+import os
+import threading
+
+import numpy as np
+
+from avp_env.common import SlotTable, RewardEngine, TagIndex
+from avp_env.common.scenario_pack import load_pack
+from avp_env.dataLoder.image import ImageLoader
+from avp_env.dataLoder.loader import DataReader
+from avp_env.dataLoder.path import PathLoader
+from avp_env.dataLoder.tokens import InstructionTokenTable
+
+
+class EnvAssets:
+    """Everything an env needs that is expensive to build and read-only afterwards."""
+
+    def __init__(self, env_type, image_shape, max_string_length, headless=False, scenarios=None,
+                 image_memory_budget=None, reduced_decode=False):
+        self.image_loader = ImageLoader(env_type, image_shape, headless=headless, scenarios=scenarios,
+                                        memory_budget=image_memory_budget, reduced_decode=reduced_decode)
+        self.data_reader = DataReader(env_type, scenarios)
+        self.parking_slots = self.data_reader.load_parking_slots()
+        self.slot_index = self.data_reader.slot_index
+        self.tag_indexes = {scan: TagIndex(self.slot_index.scan_slots(scan)) for scan in set(self.slot_index.scans)}
+        self.trajectories = self.data_reader.load_trajectories()
+        self.metrics_instructions = self.data_reader.load_metrics_instructions(env_type)
+        self.instruction_tokens = InstructionTokenTable(
+            [trajectory.instruction for trajectory in self.trajectories], max_string_length,
+            tokens=self._packed_tokens(max_string_length))
+        self.slot_table = SlotTable(self.parking_slots)
+        self.reward_engine = RewardEngine(self.slot_table, self.trajectories)
+
+    def _packed_tokens(self, max_string_length, tokenizer_name="bert-base-uncased"):
+        # Only usable when every scenario was compiled with tokens of this configuration
+        tokens = []
+        for experiment_path in self.data_reader.experiment_paths:
+            pack = load_pack(experiment_path)
+            pack_tokens = pack.tokens(tokenizer_name, max_string_length) if pack is not None else None
+            if pack_tokens is None:
+                return None
+            tokens.append(pack_tokens)
+        return np.concatenate(tokens) if tokens else None
+
+
+_assets = {}
+_assets_lock = threading.Lock()
+
+
+def _assets_key(env_type, image_shape, max_string_length, headless, scenarios, image_memory_budget,
+                reduced_decode):
+    experiment_paths = tuple(os.path.abspath(path) for path in PathLoader(env_type, scenarios).load_path())
+    return (env_type, experiment_paths, tuple(image_shape), max_string_length, headless, image_memory_budget,
+            reduced_decode)
+
+
+def get_assets(env_type, image_shape, max_string_length, headless=False, scenarios=None, image_memory_budget=None,
+               reduced_decode=False):
+    """Return the process-wide assets for this configuration, building them on first use."""
+    key = _assets_key(env_type, image_shape, max_string_length, headless, scenarios, image_memory_budget,
+                      reduced_decode)
+    # Building under the lock keeps concurrently created envs from loading the same data twice
+    with _assets_lock:
+        assets = _assets.get(key)
+        if assets is None:
+            assets = EnvAssets(env_type, image_shape, max_string_length, headless, scenarios, image_memory_budget,
+                               reduced_decode)
+            _assets[key] = assets
+        return assets
+
+
+def clear_assets():
+    """Drop every shared asset so the next env reloads from disk."""
+    with _assets_lock:
+        _assets.clear()
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+class ObservationCache:
+    """On-disk cache of resized observations, one memory-mapped .npy file (plus a JSON index) per experiment."""
+
+    version = 1
+    # Part of the file key of reduced-decode caches; bumped whenever the choice of reduction factor changes
+    reduced_decode_version = 3
+
+    def __init__(self, cache_dir, image_shape, interpolation, reduced_decode=False):
+        self.cache_dir = cache_dir
+        self.image_shape = tuple(image_shape)
+        self.interpolation = int(interpolation)
+        self.reduced_decode = bool(reduced_decode)
+
+    def _paths(self, experiment_path):
+        experiment_id = os.path.basename(experiment_path)
+        # Separate files per source directory, shape and interpolation so differently configured envs coexist
+        key = f"{os.path.abspath(experiment_path)}|{self.image_shape}|{self.interpolation}"
+        if self.reduced_decode:
+            # Reduced decoding gives slightly different pixels, so it gets its own files
+            key += f"|reduced{self.reduced_decode_version}"
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()[:8]
+        base = os.path.join(self.cache_dir, f"{experiment_id}_{digest}")
+        return base + '.npy', base + '.json'
+
+    @staticmethod
+    def _file_stat(filepath):
+        stat = os.stat(filepath)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, experiment_path):
+        """Return the cached array and {filename: row} for every entry whose source file is unchanged."""
+        array_path, index_path = self._paths(experiment_path)
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            observations = np.load(array_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None, {}
+
+        if (index.get("version") != self.version
+                or tuple(index.get("image_shape", ())) != self.image_shape
+                or index.get("interpolation") != self.interpolation
+                or index.get("reduced_decode", False) != self.reduced_decode
+                or len(index.get("entries", [])) != len(observations)):
+            return None, {}
+
+        rows = {}
+        for row, entry in enumerate(index["entries"]):
+            filepath = os.path.join(experiment_path, entry["filename"])
+            try:
+                mtime_ns, size = self._file_stat(filepath)
+            except OSError:
+                continue
+            if mtime_ns == entry["mtime_ns"] and size == entry["size"]:
+                rows[entry["filename"]] = row
+        return observations, rows
+
+    def save(self, experiment_path, entries):
+        """Write [(filename, observation), ...] for an experiment and return them re-read as a memmap.
+
+        Raises OSError when the cache directory cannot be written.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        array_path, index_path = self._paths(experiment_path)
+
+        index_entries = []
+        for filename, _ in entries:
+            mtime_ns, size = self._file_stat(os.path.join(experiment_path, filename))
+            index_entries.append({"filename": filename, "mtime_ns": mtime_ns, "size": size})
+        index = {
+            "version": self.version,
+            "image_shape": list(self.image_shape),
+            "interpolation": self.interpolation,
+            "reduced_decode": self.reduced_decode,
+            "entries": index_entries,
+        }
+        observations = np.stack([observation for _, observation in entries]) if entries \
+            else np.zeros((0,) + self.image_shape, dtype=np.uint8)
+
+        # Write to temporary files first so concurrent workers never see a half-written cache
+        tmp_suffix = f".{os.getpid()}.tmp"
+        try:
+            with open(array_path + tmp_suffix, 'wb') as f:
+                np.save(f, observations)
+            with open(index_path + tmp_suffix, 'w') as f:
+                json.dump(index, f)
+            os.replace(array_path + tmp_suffix, array_path)
+            os.replace(index_path + tmp_suffix, index_path)
+        finally:
+            for tmp_path in (array_path + tmp_suffix, index_path + tmp_suffix):
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return self.load(experiment_path)
@@ -1,49 +1,271 @@
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import cv2
+import numpy as np
 
-from avp_env.dataLoder.path import PathLoader
+from avp_env.common.scenario_pack import load_pack
+from avp_env.dataLoder.cache import ObservationCache
+from avp_env.dataLoder.path import PathLoader, CACHE_DIR
+from avp_env.dataLoder.render import RenderFrameCache, DEFAULT_RENDER_CACHE_BYTES
+from avp_env.dataLoder.store import ImageStore, ShardedImageStore
+
+
+# libjpeg can scale by 1/2, 1/4 or 1/8 while decoding, which skips most of the IDCT work
+REDUCED_READ_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                      (2, cv2.IMREAD_REDUCED_COLOR_2))
+# Start-of-frame markers carrying the image size (all SOFn except DHT, JPG and DAC)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _exif_orientation(segment):
+    """EXIF orientation (1-8) of an Exif APP1 segment, 1 when it has none, or None if it cannot be parsed."""
+    tiff = segment[6:]
+    byteorder = {b'II': 'little', b'MM': 'big'}.get(tiff[:2])
+    if byteorder is None or len(tiff) < 8:
+        return None
+    ifd = int.from_bytes(tiff[4:8], byteorder)
+    if ifd + 2 > len(tiff):
+        return None
+    for i in range(int.from_bytes(tiff[ifd:ifd + 2], byteorder)):
+        entry = tiff[ifd + 2 + 12 * i:ifd + 14 + 12 * i]
+        if len(entry) < 12:
+            return None
+        if int.from_bytes(entry[0:2], byteorder) == 0x0112:
+            orientation = int.from_bytes(entry[8:10], byteorder)
+            return orientation if 1 <= orientation <= 8 else None
+    return 1
+
+
+def jpeg_size(filepath):
+    """(height, width) of the frame cv2.imread returns, read from the JPEG header without decoding.
+
+    The start-of-frame size is swapped when the EXIF orientation rotates the frame by 90 degrees, as
+    cv2.imread applies it. None if the header or its EXIF orientation cannot be read.
+    """
+    orientation = 1
+    with open(filepath, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        while True:
+            byte = f.read(1)
+            while byte and byte != b'\xff':
+                byte = f.read(1)
+            while byte == b'\xff':
+                byte = f.read(1)
+            if not byte:
+                return None
+            marker = byte[0]
+            if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+                # Markers without a length field
+                continue
+            if marker == 0xD9:
+                return None
+            length = int.from_bytes(f.read(2), 'big')
+            if marker == 0xE1:
+                segment = f.read(length - 2)
+                # Other APP1 segments, such as the XMP packet DJI writes after the Exif one, carry no orientation
+                if segment.startswith(b'Exif\x00\x00'):
+                    orientation = _exif_orientation(segment)
+                    if orientation is None:
+                        return None
+                continue
+            if marker in _SOF_MARKERS:
+                header = f.read(5)
+                if len(header) < 5:
+                    return None
+                height, width = int.from_bytes(header[1:3], 'big'), int.from_bytes(header[3:5], 'big')
+                # Orientations 5-8 transpose the frame
+                return (width, height) if orientation >= 5 else (height, width)
+            f.seek(length - 2, 1)
+
+
+def reduced_read_flag(native_size, image_shape):
+    """Largest libjpeg reduction whose output still covers image_shape, or None.
+
+    native_size is the decoded (height, width) from jpeg_size, so each reduced side only has to cover the
+    matching side of image_shape and the final resize never scales up.
+    """
+    if native_size is None:
+        return None
+    height, width = native_size
+    target_height, target_width = image_shape[0], image_shape[1]
+    for factor, flag in REDUCED_READ_FLAGS:
+        if height // factor >= target_height and width // factor >= target_width:
+            return flag
+    return None
+
+
+def _decode_image(filepath, image_shape, interpolation, reduced_decode=False):
+    flag = reduced_read_flag(jpeg_size(filepath), image_shape) if reduced_decode else None
+    image_array = cv2.imread(filepath) if flag is None else cv2.imread(filepath, flag)
+    resized_image = cv2.resize(
+        image_array,
+        (image_shape[1], image_shape[0]),
+        interpolation=interpolation
+    )
+    return resized_image
 
 
 class ImageLoader:
-    def __init__(self, env_type, image_shape):
-        self.path_loader = PathLoader(env_type)
+    def __init__(self, env_type, image_shape, num_workers=None, executor='thread',
+                 cache_dir=CACHE_DIR, interpolation=cv2.INTER_AREA,
+                 render_cache_bytes=DEFAULT_RENDER_CACHE_BYTES, headless=False, scenarios=None,
+                 lazy=False, memory_budget=None, reduced_decode=False):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor: {executor}. It must be 'thread' or 'process'")
+        self.path_loader = PathLoader(env_type, scenarios)
         self.experiment_paths = self.path_loader.load_path()
         self.image_shape = image_shape
-        self.image_data = self._load_images()
-        self.render_image = self._load_render_images()
+        self.interpolation = interpolation
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.executor = executor
+        # Decode JPEGs at 1/2, 1/4 or 1/8 scale when that still covers image_shape, then resize the rest
+        self.reduced_decode = reduced_decode
+        self.cache = ObservationCache(cache_dir, image_shape, interpolation, reduced_decode) if cache_dir else None
+        self.render_cache_bytes = render_cache_bytes
+        self.headless = headless
+        self.load_stats = {}
+        # With a memory budget, scenarios are loaded as lazy shards and evicted beyond the budget
+        self.lazy = lazy or memory_budget is not None
+        self.memory_budget = memory_budget
+        if self.lazy:
+            self.observations, self.render_frames = self._load_shards()
+        else:
+            self.observations, self.render_frames = self._load_images()
 
-    def _load_images(self):
-        image_data = {}
-        for experiment_path in self.experiment_paths:
-            experiment_id = os.path.basename(experiment_path)
-            for filename in os.listdir(experiment_path):
-                if filename.endswith('.JPG'):
-                    filepath = os.path.join(experiment_path, filename)
-                    image_array = cv2.imread(filepath)
-                    resized_image = cv2.resize(
-                        image_array,
-                        (self.image_shape[1], self.image_shape[0]),
-                        interpolation=cv2.INTER_AREA
-                    )
-                    # image_data[filename] = resized_image
-
-                    # Use a unique key combining experiment_id and filename
-                    unique_key = f"{experiment_id}/{filename}"
-                    image_data[unique_key] = resized_image
-        return image_data
-
-    def _load_render_images(self):
-        render_image = {}
+    def _list_images(self):
+        image_files = []
         for experiment_path in self.experiment_paths:
-            experiment_id = os.path.basename(experiment_path)
-            for filename in os.listdir(experiment_path):
-                if filename.endswith('.JPG'):
-                    filepath = os.path.join(experiment_path, filename)
-                    image_array = cv2.imread(filepath)
-                    # render_image[filename] = image_array
-
-                    # Use a unique key combining experiment_id and filename
-                    unique_key = f"{experiment_id}/{filename}"
-                    render_image[unique_key] = image_array
-        return render_image
+            pack = load_pack(experiment_path)
+            filenames = pack.image_files() if pack is not None else None
+            if filenames is None:
+                filenames = sorted(filename for filename in os.listdir(experiment_path) if filename.endswith('.JPG'))
+            image_files.extend((experiment_path, filename) for filename in filenames)
+        return image_files
+
+    def _load_cached_observations(self):
+        cached = {}
+        if self.cache is not None:
+            for experiment_path in self.experiment_paths:
+                cached[experiment_path] = self.cache.load(experiment_path)
+        return cached
+
+    def _experiment_block(self, experiment_path, entries, cached_images, cached_rows):
+        """Contiguous observations of one experiment, reusing the cache file as-is when it is fully valid."""
+        filenames = [filename for filename, _ in entries]
+        if cached_images is not None and [cached_rows.get(f) for f in filenames] == list(range(len(cached_images))):
+            return cached_images
+
+        observations = [
+            cached_images[cached_rows[filename]] if observation is None else observation
+            for filename, observation in entries
+        ]
+        if self.cache is not None:
+            # Rewrite the cache of every experiment that had a stale, new or removed file
+            try:
+                cached_images, _ = self.cache.save(experiment_path, list(zip(filenames, observations)))
+                return cached_images
+            except OSError as e:
+                # A read-only data mount only costs the cache, the decoded frames are still used
+                print(f"Caching observations of {experiment_path} failed: {e}")
+        return np.stack(observations) if observations else np.zeros((0,) + tuple(self.image_shape), dtype=np.uint8)
+
+    def _decode(self, filepaths):
+        shapes = [self.image_shape] * len(filepaths)
+        interpolations = [self.interpolation] * len(filepaths)
+        reduced = [self.reduced_decode] * len(filepaths)
+        # cv2 releases the GIL while decoding, so threads already scale; processes are kept as an option
+        pool_class = ThreadPoolExecutor if self.executor == 'thread' else ProcessPoolExecutor
+        with pool_class(max_workers=self.num_workers) as pool:
+            return list(pool.map(_decode_image, filepaths, shapes, interpolations, reduced))
+
+    def _load_shard(self, experiment_path, filenames):
+        """Observations of one experiment, decoding only the frames without a valid cache entry."""
+        cached_images, cached_rows = self.cache.load(experiment_path) if self.cache is not None else (None, {})
+        missing = [filename for filename in filenames if filename not in cached_rows]
+        decoded = iter(self._decode([os.path.join(experiment_path, filename) for filename in missing]))
+        entries = [(filename, None if filename in cached_rows else next(decoded)) for filename in filenames]
+        return self._experiment_block(experiment_path, entries, cached_images, cached_rows)
+
+    def _load_shards(self):
+        start_time = time.perf_counter()
+        image_files = self._list_images()
+        experiment_paths = {os.path.basename(experiment_path): experiment_path for experiment_path, _ in image_files}
+        filenames = {}
+        for experiment_path, filename in image_files:
+            filenames.setdefault(os.path.basename(experiment_path), []).append(filename)
+
+        def load_shard(scan):
+            return self._load_shard(experiment_paths[scan], filenames[scan])
+
+        keys = [(os.path.basename(experiment_path), filename) for experiment_path, filename in image_files]
+        observations = ShardedImageStore(keys, load_shard, self.image_shape, self.memory_budget)
+        filepaths = [os.path.join(experiment_path, filename) for experiment_path, filename in image_files]
+        render_frames = RenderFrameCache(filepaths, self.render_cache_bytes, self.headless)
+
+        elapsed = time.perf_counter() - start_time
+        self.load_stats = {
+            "images": len(image_files),
+            "scenarios": len(filenames),
+            "seconds": elapsed,
+            "phases": {"list": elapsed},
+        }
+        print(f"Indexed {len(image_files)} images of {len(filenames)} scenarios in {elapsed:.2f}s (loaded lazily)")
+        return observations, render_frames
+
+    def _load_images(self):
+        start_time = time.perf_counter()
+        image_files = self._list_images()
+        list_time = time.perf_counter()
+        cached = self._load_cached_observations()
+        cache_time = time.perf_counter()
+        hits = [filename in cached.get(experiment_path, (None, {}))[1] for experiment_path, filename in image_files]
+
+        filepaths = [os.path.join(experiment_path, filename) for experiment_path, filename in image_files]
+        # Only frames without a valid cache entry are decoded
+        missing = [filepath for filepath, hit in zip(filepaths, hits) if not hit]
+        decoded = iter(self._decode(missing))
+        decode_time = time.perf_counter()
+
+        entries = {}
+        for (experiment_path, filename), hit in zip(image_files, hits):
+            entries.setdefault(experiment_path, []).append((filename, None if hit else next(decoded)))
+
+        blocks = []
+        for experiment_path, experiment_entries in entries.items():
+            cached_images, cached_rows = cached.get(experiment_path, (None, {}))
+            blocks.append(self._experiment_block(experiment_path, experiment_entries, cached_images, cached_rows))
+        # A single experiment keeps the memory-mapped cache file as its store without copying
+        images = blocks[0] if len(blocks) == 1 else np.concatenate(blocks) if blocks \
+            else np.zeros((0,) + tuple(self.image_shape), dtype=np.uint8)
+        store_time = time.perf_counter()
+
+        # Rows follow the (experiment, filename) listing order in both stores
+        keys = [(os.path.basename(experiment_path), filename) for experiment_path, filename in image_files]
+        observations = ImageStore(images, keys)
+        # Full-resolution frames are only needed by render(), so they are decoded on first access
+        render_frames = RenderFrameCache(filepaths, self.render_cache_bytes, self.headless)
+
+        elapsed = time.perf_counter() - start_time
+        self.load_stats = {
+            "images": len(image_files),
+            "decoded": len(missing),
+            "cache_hits": sum(hits),
+            "seconds": elapsed,
+            "images_per_sec": len(image_files) / elapsed if elapsed > 0 else 0.0,
+            # Seconds spent in each loading phase, in order
+            "phases": {
+                "list": list_time - start_time,
+                "cache_load": cache_time - list_time,
+                "decode": decode_time - cache_time,
+                "cache_save": store_time - decode_time,
+                "index": start_time + elapsed - store_time,
+            },
+        }
+        print(
+            f"Loaded {self.load_stats['images']} images ({self.load_stats['cache_hits']} cached) in {elapsed:.2f}s "
+            f"({self.load_stats['images_per_sec']:.1f} images/s, {self.num_workers} {self.executor} workers)"
+        )
+        return observations, render_frames
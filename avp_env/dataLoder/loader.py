@@ -1,14 +1,16 @@
 import json
 import os
 
-from avp_env.common import Trajectory, Instruction, ParkingSlot
+from avp_env.common import Trajectory, Instruction, ParkingSlot, ParkingSlotIndex
+from avp_env.common.scenario_pack import load_commands, load_pack
 from avp_env.dataLoder.path import PathLoader
 
 
 class DataReader:
-    def __init__(self, env_type):
-        self.path_loader = PathLoader(env_type)
+    def __init__(self, env_type, scenarios=None):
+        self.path_loader = PathLoader(env_type, scenarios)
         self.experiment_paths = self.path_loader.load_path()
+        self.slot_index = None
 
     @staticmethod
     def _load_json(json_path, filename):
@@ -20,19 +22,32 @@ class DataReader:
         combined_parking_data = []
 
         for experiment_path in self.experiment_paths:
-            parking_data = self._load_json(experiment_path, 'parking_slots.json')
-            combined_parking_data.extend(parking_data)
+            # A compiled scenario pack is preferred; it decodes to exactly the JSON content
+            pack = load_pack(experiment_path)
+            if pack is not None:
+                parking_data = pack.parking_slots()
+            else:
+                parking_data = self._load_json(experiment_path, 'parking_slots.json')
+            # Remember which scan every slot came from so lookups stay correct across scenarios
+            scan = os.path.basename(experiment_path)
+            combined_parking_data.extend((scan, slot_data) for slot_data in parking_data)
 
             # parking_data_sorted = sorted(parking_data, key=lambda x: x["ParkingID"])
-        combined_parking_data_sorted = sorted(combined_parking_data, key=lambda x: x["ParkingID"])
+        combined_parking_data_sorted = sorted(combined_parking_data, key=lambda x: x[1]["ParkingID"])
 
-        return [ParkingSlot(slot_data) for slot_data in combined_parking_data_sorted]
+        parking_slots = [ParkingSlot(slot_data) for _, slot_data in combined_parking_data_sorted]
+        self.slot_index = ParkingSlotIndex([scan for scan, _ in combined_parking_data_sorted], parking_slots)
+        return parking_slots
 
     def load_trajectories(self):
         combined_traj_data = []
         
         for experiment_path in self.experiment_paths:
-            traj_data = self._load_json(experiment_path, 'Traj.json')
+            pack = load_pack(experiment_path)
+            if pack is not None:
+                traj_data = pack.trajectories()
+            else:
+                traj_data = self._load_json(experiment_path, 'Traj.json')
             combined_traj_data.extend(traj_data)
 
         return [Trajectory(traj_entry) for traj_entry in combined_traj_data]
@@ -44,6 +59,8 @@ class DataReader:
             instruction_name = 'test_command.json'
         else:
             instruction_name = ''
-        instruction_data = self._load_json('../data/commands', instruction_name)
+        instruction_data = load_commands(os.path.join('../data/commands', instruction_name))
+        if instruction_data is None:
+            instruction_data = self._load_json('../data/commands', instruction_name)
 
         return [Instruction(instruction_entry) for instruction_entry in instruction_data]
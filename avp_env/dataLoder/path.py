@@ -1,8 +1,19 @@
+import glob
+import os
+
+# Preprocessed observations are cached next to the dataset
+CACHE_DIR = '../data/cache'
+
+
 class PathLoader:
-    def __init__(self, env_type):
+    def __init__(self, env_type, scenarios=None):
         self.env_type = env_type
+        # Scenario directories or glob patterns (e.g. '../data/Vision/2024*'); None keeps the default per env_type
+        self.scenarios = [scenarios] if isinstance(scenarios, str) else scenarios
 
     def load_path(self):
+        if self.scenarios is not None:
+            return self._expand_scenarios()
         if self.env_type == 'train':
             experiment_paths = ['../data/Vision/20240518_01']
         elif self.env_type == 'test':
@@ -10,3 +21,25 @@ class PathLoader:
         else:
             experiment_paths = []
         return experiment_paths
+
+    def _expand_scenarios(self):
+        experiment_paths = []
+        scan_paths = {}
+        for scenario in self.scenarios:
+            if any(char in scenario for char in '*?['):
+                matches = sorted(path for path in glob.glob(scenario) if os.path.isdir(path))
+                if not matches:
+                    raise ValueError(f"No scenario directory matches {scenario}")
+            else:
+                matches = [scenario]
+            for path in matches:
+                # 'm_0' and 'm_0/' are the same scenario, and its scan name is the directory name
+                path = os.path.normpath(path)
+                scan = os.path.basename(path)
+                other = scan_paths.setdefault(scan, path)
+                if os.path.abspath(other) != os.path.abspath(path):
+                    # Images, slots and tags are all keyed by scan name, so it must be unique
+                    raise ValueError(f"Scenarios {other} and {path} have the same scan name {scan}")
+                if path not in experiment_paths:
+                    experiment_paths.append(path)
+        return experiment_paths
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+
+# Roughly seven native-resolution DJI frames
+DEFAULT_RENDER_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class RenderFrameCache:
+    """Full-resolution frames decoded on first access and kept in an LRU bounded by a byte budget."""
+
+    def __init__(self, filepaths, max_bytes=DEFAULT_RENDER_CACHE_BYTES, headless=False):
+        # filepaths[row] is the source JPG of the frame at that row, matching the observation store rows
+        self.filepaths = list(filepaths)
+        self.max_bytes = max_bytes
+        self.headless = headless
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.filepaths)
+
+    def __getitem__(self, row):
+        if self.headless:
+            raise RuntimeError("Render frames are not available in headless mode")
+        with self._lock:
+            frame = self._frames.get(row)
+            if frame is not None:
+                self._frames.move_to_end(row)
+                self.hits += 1
+                return frame
+            self.misses += 1
+
+        frame = cv2.imread(self.filepaths[row])
+        if frame is None:
+            raise FileNotFoundError(f"Could not read render frame {self.filepaths[row]}")
+
+        with self._lock:
+            if row not in self._frames:
+                self._frames[row] = frame
+                self.nbytes += frame.nbytes
+            # Always keep the most recent frame, even when it alone exceeds the budget
+            while self.nbytes > self.max_bytes and len(self._frames) > 1:
+                _, evicted = self._frames.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+            return self._frames.get(row, frame)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
@@ -0,0 +1,196 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+
+def image_position(filename):
+    """Map a drone frame name such as 'DJI_07.JPG' to its path position (7)."""
+    return int(os.path.splitext(filename)[0].split('_')[-1])
+
+
+class ImageStore:
+    """Contiguous (N, H, W, C) uint8 tensor with a precomputed (scan, position) -> row table."""
+
+    def __init__(self, images, keys):
+        # keys[row] is the (scan, filename) pair stored at that row
+        if len(images) != len(keys):
+            raise ValueError(f"Got {len(images)} images for {len(keys)} keys")
+        self.images = images
+        self._index_keys(keys)
+
+    def _index_keys(self, keys):
+        self.keys = list(keys)
+        self.scans = sorted({scan for scan, _ in self.keys})
+        self.scan_index = {scan: i for i, scan in enumerate(self.scans)}
+
+        max_position = max((image_position(filename) for _, filename in self.keys), default=0)
+        self.row_table = np.full((len(self.scans), max_position + 1), -1, dtype=np.int64)
+        for row, (scan, filename) in enumerate(self.keys):
+            self.row_table[self.scan_index[scan], image_position(filename)] = row
+
+    def __len__(self):
+        return len(self.images)
+
+    def __getitem__(self, row):
+        return self.images[row]
+
+    def scan_rows(self, scan):
+        """Row of every position of a scan (-1 where the frame is missing)."""
+        return self.row_table[self.scan_index[scan]]
+
+    def row(self, scan, position):
+        row = int(self.scan_rows(scan)[position])
+        if row < 0:
+            raise KeyError(f"No image for position {position} of scan {scan}")
+        return row
+
+    def take(self, rows, out=None):
+        """Gather a batch of images with a single fancy-index, optionally into a preallocated buffer."""
+        return np.take(self.images, np.asarray(rows), axis=0, out=out)
+
+    @property
+    def nbytes(self):
+        return self.images.nbytes
+
+
+class ShardedImageStore(ImageStore):
+    """ImageStore whose rows are materialized one scan (shard) at a time, on first access.
+
+    Rows and the (scan, position) table are the same as for the eager store, so envs use either one.
+    Loaded shards are kept in an LRU; once their total size exceeds memory_budget bytes the least
+    recently used ones are dropped and reloaded when needed again. Pinned shards (the scenario of a
+    running episode, or one reserved by a prefetcher) and the shard just loaded are never dropped.
+    load_shard(scan) must return the (n, H, W, C) array of that scan's rows in key order.
+    """
+
+    def __init__(self, keys, load_shard, image_shape, memory_budget=None):
+        self._index_keys(keys)
+        self.load_shard = load_shard
+        self.image_shape = tuple(image_shape)
+        self.memory_budget = memory_budget
+
+        # Each scan occupies one contiguous block of rows
+        self.shard_scans = []
+        shard_starts = []
+        for row, (scan, _) in enumerate(self.keys):
+            if not self.shard_scans or self.shard_scans[-1] != scan:
+                if scan in self.shard_scans:
+                    raise ValueError(f"Rows of scan {scan} are not contiguous")
+                self.shard_scans.append(scan)
+                shard_starts.append(row)
+        self.shard_starts = np.array(shard_starts, dtype=np.int64)
+        self.shard_lengths = np.diff(np.append(self.shard_starts, len(self.keys)))
+
+        self.shards = OrderedDict()
+        self.pins = Counter()
+        self.stats = {"loads": 0, "hits": 0, "evictions": 0}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _shard_id(self, row):
+        return int(np.searchsorted(self.shard_starts, row, side='right')) - 1
+
+    def shard(self, scan):
+        """The rows of one scan, loading them (and evicting others) if they are not resident."""
+        with self._lock:
+            images = self.shards.get(scan)
+            if images is not None:
+                self.shards.move_to_end(scan)
+                self.stats["hits"] += 1
+                return images
+            loading = self._loading.get(scan)
+            if loading is None:
+                loading = self._loading[scan] = threading.Event()
+                loader = True
+            else:
+                loader = False
+        if not loader:
+            # Another thread (e.g. a prefetcher) is already loading this shard
+            loading.wait()
+            return self.shard(scan)
+
+        # Loaded outside the lock so rows of resident shards stay available meanwhile
+        try:
+            shard_id = self.shard_scans.index(scan)
+            images = self.load_shard(scan)
+            if len(images) != self.shard_lengths[shard_id]:
+                raise ValueError(f"Got {len(images)} images for the {self.shard_lengths[shard_id]} rows of {scan}")
+            with self._lock:
+                self.shards[scan] = images
+                self.stats["loads"] += 1
+                self._evict(keep=scan)
+            return images
+        finally:
+            with self._lock:
+                del self._loading[scan]
+            loading.set()
+
+    def _evict(self, keep):
+        if self.memory_budget is None:
+            return
+        for scan in list(self.shards):
+            if self.nbytes <= self.memory_budget:
+                break
+            if scan != keep and not self.pins[scan]:
+                del self.shards[scan]
+                self.stats["evictions"] += 1
+
+    def is_resident(self, scan):
+        return scan in self.shards
+
+    def is_pinned(self, scan):
+        return self.pins[scan] > 0
+
+    def shard_nbytes(self, scan):
+        return int(self.shard_lengths[self.shard_scans.index(scan)]) * int(np.prod(self.image_shape))
+
+    def pin(self, scan, if_fits=False):
+        """Keep a scan's shard from being evicted until unpin(); pins are counted per caller.
+
+        With if_fits=True the pin is only taken (and True returned) when the shard fits in the memory
+        budget together with every other pinned shard, so loading it cannot push a pinned shard out.
+        """
+        with self._lock:
+            if if_fits and self.memory_budget is not None:
+                pinned = {pinned_scan for pinned_scan, count in self.pins.items() if count} | {scan}
+                if sum(self.shard_nbytes(pinned_scan) for pinned_scan in pinned) > self.memory_budget:
+                    return False
+            self.pins[scan] += 1
+            return True
+
+    def unpin(self, scan):
+        with self._lock:
+            self.pins[scan] -= 1
+            if self.pins[scan] <= 0:
+                del self.pins[scan]
+                # Shards kept over the budget only because they were pinned can go now
+                self._evict(keep=None)
+
+    def __getitem__(self, row):
+        shard_id = self._shard_id(row)
+        return self.shard(self.shard_scans[shard_id])[row - self.shard_starts[shard_id]]
+
+    def take(self, rows, out=None):
+        rows = np.asarray(rows)
+        if out is None:
+            out = np.empty((len(rows),) + self.image_shape, dtype=np.uint8)
+        shard_ids = np.searchsorted(self.shard_starts, rows, side='right') - 1
+        for shard_id in np.unique(shard_ids):
+            selected = shard_ids == shard_id
+            images = self.shard(self.shard_scans[shard_id])
+            out[selected] = images[rows[selected] - self.shard_starts[shard_id]]
+        return out
+
+    @property
+    def images(self):
+        """Every row as one array; this loads all shards, so it ignores the memory budget."""
+        return self.take(np.arange(len(self.keys)))
+
+    @property
+    def nbytes(self):
+        return sum(images.nbytes for images in self.shards.values())
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+from transformers import AutoTokenizer
+
+from avp_env.dataLoder.path import CACHE_DIR
+from avp_env.utils.get_proxy_for_tokenizer import get_proxy
+
+
+class InstructionTokenTable:
+    """All trajectory instructions encoded once into an (n_traj, max_string_length) int64 table."""
+
+    def __init__(self, instructions, max_string_length, tokenizer_name="bert-base-uncased",
+                 cache_dir=CACHE_DIR, tokenizer=None, tokens=None):
+        self.instructions = list(instructions)
+        self.max_string_length = max_string_length
+        self.tokenizer_name = tokenizer_name
+        self.cache_dir = cache_dir
+        self._tokenizer = tokenizer
+        self.load_stats = {}
+        start_time = time.perf_counter()
+        self.tokens = self._load_tokens(tokens)
+        self.load_stats["seconds"] = time.perf_counter() - start_time
+        # Rows are handed out as views, so guard the shared table against in-place edits
+        self.tokens.flags.writeable = False
+
+    @property
+    def tokenizer(self):
+        # Only loaded when the table has to be (re)built or a caller needs it directly
+        if self._tokenizer is None:
+            self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name, proxies=get_proxy())
+        return self._tokenizer
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __getitem__(self, index):
+        return self.tokens[index]
+
+    def _cache_path(self):
+        # The table is content-addressed, so any change of input yields a new file
+        key = json.dumps([self.tokenizer_name, self.max_string_length, self.instructions])
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"tokens_{digest}.npy")
+
+    def encode(self, instructions):
+        if not instructions:
+            return np.zeros((0, self.max_string_length), dtype=np.int64)
+        encoded = self.tokenizer(
+            list(instructions),
+            add_special_tokens=True,
+            max_length=self.max_string_length,
+            padding='max_length',
+            truncation=True
+        )
+        return np.array(encoded["input_ids"], dtype=np.int64)
+
+    def _load_tokens(self, tokens=None):
+        # Rows tokenized ahead of time (e.g. from compiled scenario packs) are used as they are
+        if tokens is not None and np.shape(tokens) == (len(self.instructions), self.max_string_length):
+            self.load_stats["cached"] = True
+            return np.array(tokens, dtype=np.int64)
+
+        if self.cache_dir:
+            cache_path = self._cache_path()
+            try:
+                tokens = np.load(cache_path)
+                if tokens.shape == (len(self.instructions), self.max_string_length):
+                    self.load_stats["cached"] = True
+                    return tokens
+            except (OSError, ValueError):
+                pass
+
+        self.load_stats["cached"] = False
+        tokens = self.encode(self.instructions)
+
+        if self.cache_dir:
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, tokens)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                # Not cached, the table is simply tokenized again next time
+                print(f"Caching instruction tokens failed: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return tokens
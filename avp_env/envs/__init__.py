@@ -1,6 +1,13 @@
 from avp_env.envs.avp_env import AutonomousParkingEnv, MetricsEnv
+from avp_env.envs.vector_env import AutonomousParkingVectorEnv
+from avp_env.envs.shared_vector_env import SharedMemoryVectorEnv
+from avp_env.envs.evaluation import EvaluationRunner, evaluate
 
 __all__ = [
     "AutonomousParkingEnv",
-    "MetricsEnv"
+    "MetricsEnv",
+    "AutonomousParkingVectorEnv",
+    "SharedMemoryVectorEnv",
+    "EvaluationRunner",
+    "evaluate"
 ]
@@ -1,32 +1,55 @@
 import random
 
+import cv2
 import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
-from transformers import AutoTokenizer
 
-from avp_env.dataLoder import ImageLoader, DataReader
-from avp_env.utils.get_proxy_for_tokenizer import get_proxy
+from avp_env.dataLoder.assets import get_assets
+from avp_env.envs.prefetch import EpisodePrefetcher
+from avp_env.envs.sampling import ScenarioSampler
+from avp_env.utils.profiler import Profiler
+
+# Hot-path methods timed by enable_profiling
+PROFILED_METHODS = ('reset', 'step', 'update_current_observation', 'get_parking_slots', 'get_reward')
+# Positions along the drone path; an episode ends at the last one
+LAST_POSITION = 29
 
 
 class AutonomousParkingEnv(gym.Env):
-    def __init__(self, env_type='train'):
+    def __init__(self, env_type='train', headless=False, scenarios=None, image_memory_budget=None,
+                 episodes_per_scenario=None, prefetch_depth=0, reduced_decode=False):
         super(AutonomousParkingEnv, self).__init__()
         self.env_type = env_type
+        self.headless = headless
         self.image_shape = (128, 400, 3)
         self.max_string_length = 64
 
-        # Initialize helpers
-        self.image_loader = ImageLoader(self.env_type, self.image_shape)
-        self.data_reader = DataReader(self.env_type)
-        self.tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased", proxies=get_proxy())
+        # Initialize helpers, shared with every other env of the same configuration in this process.
+        # scenarios selects several Vision directories (list or glob); with image_memory_budget (bytes)
+        # their frames are loaded per scenario on demand and evicted beyond the budget. reduced_decode lets
+        # libjpeg decode frames at 1/2-1/8 scale before the final resize
+        self.assets = get_assets(self.env_type, self.image_shape, self.max_string_length, self.headless,
+                                 scenarios, image_memory_budget, reduced_decode)
+        self.image_loader = self.assets.image_loader
+        self.data_reader = self.assets.data_reader
 
         # Initialize environment data
-        self.image_data = self.image_loader.image_data
-        self.render_image = self.image_loader.render_image
-        self.parking_slots = self.data_reader.load_parking_slots()
-        self.trajectories = self.data_reader.load_trajectories()
-        self.metrics_instructions = self.data_reader.load_metrics_instructions(self.env_type)
+        self.image_data = self.image_loader.observations
+        self.render_image = self.image_loader.render_frames
+        self.parking_slots = self.assets.parking_slots
+        self.slot_index = self.assets.slot_index
+        self.tag_indexes = self.assets.tag_indexes
+        self.reward_engine = self.assets.reward_engine
+        self.trajectories = self.assets.trajectories
+        self.metrics_instructions = self.assets.metrics_instructions
+        self.instruction_tokens = self.assets.instruction_tokens
+        # Keep several consecutive episodes on one scenario so its frames stay loaded
+        self.scenario_sampler = ScenarioSampler(self.trajectories, episodes_per_scenario) \
+            if episodes_per_scenario else None
+        # Targets of the next prefetch_depth episodes are drawn early and their frames warmed in the background
+        self.prefetcher = EpisodePrefetcher(self.image_data, self.trajectories, self._draw_target, prefetch_depth) \
+            if prefetch_depth else None
 
         # Define observation space
         self.observation_space = spaces.Tuple((
@@ -41,14 +64,32 @@ class AutonomousParkingEnv(gym.Env):
         self.current_observation = (
             np.zeros(self.image_shape, dtype=np.uint8), np.zeros(self.max_string_length, dtype=np.uint8))
         self.render_observation = None
+        self.render_row = None
         self.current_position = None
+        self.scan_rows = None
+        self.target_index = None
         self.target_instruction = None
         self.inital_instruction = None
         self.perfect_trajectory = None
         self.CurrentParkingSlot = None
+        self.pinned_scan = None
+        self.profiler = None
+
+    @property
+    def tokenizer(self):
+        return self.instruction_tokens.tokenizer
 
     def get_parking_slots(self, loc_id, path_id):
-        return [slot for slot in self.parking_slots if slot.LocID == loc_id and slot.PathID == path_id]
+        scan = self.target_instruction.scan if self.target_instruction is not None else None
+        return self.slot_index.lookup(path_id, loc_id, scan)
+
+    def get_acceptable_parking_slots(self):
+        # Every slot of the target scan that matches all tags of the target instruction
+        tags = getattr(self.target_instruction, 'tags', None)
+        tag_index = self.tag_indexes.get(self.target_instruction.scan)
+        if not tags or tag_index is None:
+            return []
+        return tag_index.match(tags)
 
     @staticmethod
     def get_perfect_trajectory(trajectory):
@@ -56,33 +97,48 @@ class AutonomousParkingEnv(gym.Env):
             perfect_trajectory = [0] * (trajectory.path_id - 1)
             perfect_trajectory.append(trajectory.loc_id)
         else:
-            perfect_trajectory = [0] * 29
+            perfect_trajectory = [0] * LAST_POSITION
         return perfect_trajectory
 
     def update_current_observation(self):
-        if self.current_position < 10:
-            image_path = f"{self.target_instruction.scan}/DJI_0{self.current_position}.JPG"
-        else:
-            image_path = f"{self.target_instruction.scan}/DJI_{self.current_position}.JPG"
-        self.render_observation = self.render_image[image_path]
-        self.current_observation = (self.image_data[image_path], self.inital_instruction)
+        row = self.scan_rows[self.current_position]
+        if row < 0:
+            raise KeyError(f"No image for position {self.current_position} of scan {self.target_instruction.scan}")
+        # The full-resolution frame is only fetched when render() is called
+        self.render_row = row
+        self.current_observation = (self.image_data[row], self.inital_instruction)
 
     def reset(self, ins_index=None):
         self.current_position = 1
-        self.target_instruction = random.choice(self.trajectories)
-        instruction_tokens = self.tokenizer.encode(
-            self.target_instruction.instruction,
-            add_special_tokens=True,
-            max_length=self.max_string_length,
-            padding='max_length',
-            truncation=True
-        )
-        self.inital_instruction = np.array(instruction_tokens)
+        if self.prefetcher is not None:
+            self.target_index = self.prefetcher.next_target()
+        else:
+            self.target_index = self._draw_target()
+        self.target_instruction = self.trajectories[self.target_index]
+        self.inital_instruction = self.instruction_tokens[self.target_index]
         self.perfect_trajectory = self.get_perfect_trajectory(self.target_instruction)
+        self.scan_rows = self.image_data.scan_rows(self.target_instruction.scan)
+        self._pin_scan(self.target_instruction.scan)
+        if self.prefetcher is not None:
+            self.prefetcher.start_episode()
 
         self.update_current_observation()
         return self.current_observation
 
+    def _pin_scan(self, scan):
+        # Keep the running episode's frames resident when scenarios are loaded within a memory budget
+        if not hasattr(self.image_data, "pin") or scan == self.pinned_scan:
+            return
+        self.image_data.pin(scan)
+        if self.pinned_scan is not None:
+            self.image_data.unpin(self.pinned_scan)
+        self.pinned_scan = scan
+
+    def _draw_target(self):
+        if self.scenario_sampler is not None:
+            return self.scenario_sampler.sample()
+        return random.randrange(len(self.trajectories))
+
     def get_perfect_traj(self):
         return self.perfect_trajectory
 
@@ -97,15 +153,15 @@ class AutonomousParkingEnv(gym.Env):
 
     def step(self, action):
         # Execute action and return reward, next observation, whether to terminate, debugging information
-        if self.current_position > 29:
+        if self.current_position > LAST_POSITION:
             reward = -1
             done = True
             self.CurrentParkingSlot = []
-        elif action == 0 and self.current_position != 29:
+        elif action == 0 and self.current_position != LAST_POSITION:
             reward = 0
             self.current_position += 1
             done = False
-        elif action == 0 and self.current_position == 29:
+        elif action == 0 and self.current_position == LAST_POSITION:
             reward = -1
             done = True
             self.CurrentParkingSlot = []
@@ -126,56 +182,72 @@ class AutonomousParkingEnv(gym.Env):
         return self.current_observation, reward, done, info
 
     def get_reward(self, current_parking_slot):
-        reward = -1  # Give a negative punitive reward for parking in a non-existent parking space
-        if current_parking_slot:
-            for slot in current_parking_slot:
-                # Give a big reward if the current parking space is the same as the target parking slot
-                if slot.ParkingID == self.target_instruction.ParkingID:
-                    reward = 10
-                # Give a negative punitive reward for not having an empty parking slot
-                elif slot.Occupied != 0:
-                    reward = -0.5
-                # Give a negative punitive reward for parking in the wrong disabled slot
-                elif slot.Disabled != self.target_instruction.tags['Disabled']:
-                    reward = -0.2
-                # Give a negative punitive reward for parking in the wrong charging slot
-                elif slot.Charging != self.target_instruction.tags['Charging']:
-                    reward = -0.2
-                else:
-                    reward = 5
-                    for key, value in self.target_instruction.tags.items():
-                        # If the attribute in slot is the same as the target attribute, give a medium reward
-                        if getattr(slot, key, None) == value:
-                            reward += 0.2
+        # Scalar rules of RewardEngine, which is only used for batches; they return the same values
+        if not current_parking_slot:
+            # Give a negative punitive reward for parking in a non-existent parking space
+            return -1
+        # When several slots share a location the last one decides, as it always has
+        slot = current_parking_slot[-1]
+        # Give a big reward if the current parking space is the same as the target parking slot
+        if slot.ParkingID == self.target_instruction.ParkingID:
+            return 10
+        # Give a negative punitive reward for not having an empty parking slot
+        if slot.Occupied != 0:
+            return -0.5
+        # Give a negative punitive reward for parking in the wrong disabled or charging slot
+        if slot.Disabled != self.target_instruction.tags['Disabled']:
+            return -0.2
+        if slot.Charging != self.target_instruction.tags['Charging']:
+            return -0.2
+        reward = 5
+        for key, value in self.target_instruction.tags.items():
+            # If the attribute in slot is the same as the target attribute, give a medium reward
+            if getattr(slot, key, None) == value:
+                reward += 0.2
         return reward
 
     def render(self, mode='human'):
-        self.render_observation[:, :, [0, 2]] = self.render_observation[:, :, [2, 0]]
+        # Convert to RGB on a copy so the cached BGR frame stays untouched
+        self.render_observation = cv2.cvtColor(self.render_image[self.render_row], cv2.COLOR_BGR2RGB)
         # Optional rendering method for visualising the state of the environment
         img, command = self.render_observation, self.target_instruction.instruction
         return img, command
 
     def close(self):
-        pass
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        if self.pinned_scan is not None:
+            self.image_data.unpin(self.pinned_scan)
+            self.pinned_scan = None
+
+    def enable_profiling(self, dump_path=None, dump_interval=60.0, window=10000):
+        """Time the hot-path methods of this env; returns the Profiler (see profiling_stats)."""
+        if self.profiler is None:
+            self.profiler = Profiler(window, dump_path, dump_interval)
+            self.profiler.instrument(self, PROFILED_METHODS)
+            # Loading and tokenization happen once, when the shared assets are built
+            load_stats = self.image_loader.load_stats
+            self.profiler.add_phases('image_loader', dict(
+                load_stats.get('phases', {}), images=load_stats.get('images'), decoded=load_stats.get('decoded'),
+                seconds=load_stats.get('seconds')))
+            self.profiler.add_phases('tokenization', self.instruction_tokens.load_stats)
+        return self.profiler
+
+    def disable_profiling(self):
+        if self.profiler is not None:
+            self.profiler.restore()
+            self.profiler = None
+
+    def profiling_stats(self):
+        return self.profiler.stats() if self.profiler is not None else {}
 
 
 class MetricsEnv(AutonomousParkingEnv):
-    def __init__(self, env_type='test'):
-        super(MetricsEnv, self).__init__(env_type)
+    def __init__(self, env_type='test', headless=False, scenarios=None, image_memory_budget=None):
+        super(MetricsEnv, self).__init__(env_type, headless, scenarios, image_memory_budget)
         self.env_type = env_type
         self.trajectory_index = 0  # Initialize trajectory index
         self.traj_len = len(self.trajectories)
-        # Initialize helpers
-        self.image_loader = ImageLoader(self.env_type, self.image_shape)
-        self.data_reader = DataReader(self.env_type)
-        self.tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased", proxies=get_proxy())
-
-        # Initialize environment data
-        self.image_data = self.image_loader.image_data
-        self.render_image = self.image_loader.render_image
-        self.parking_slots = self.data_reader.load_parking_slots()
-        self.trajectories = self.data_reader.load_trajectories()
-        self.metrics_instructions = self.data_reader.load_metrics_instructions(self.env_type)
 
     def get_scan(self):
         return self.target_instruction.scan
@@ -184,21 +256,16 @@ class MetricsEnv(AutonomousParkingEnv):
         self.current_position = 1
         if ins_index is None:
             # Select the next trajectory in sequence
-            self.target_instruction = self.trajectories[self.trajectory_index]
+            self.target_index = self.trajectory_index
             self.trajectory_index = (self.trajectory_index + 1) % len(self.trajectories)
         else:
-            self.target_instruction = self.trajectories[ins_index]
-
-        instruction_tokens = self.tokenizer.encode(
-            self.target_instruction.instruction,
-            add_special_tokens=True,
-            max_length=self.max_string_length,
-            padding='max_length',
-            truncation=True
-        )
+            self.target_index = ins_index
+        self.target_instruction = self.trajectories[self.target_index]
 
-        self.inital_instruction = np.array(instruction_tokens)
+        self.inital_instruction = self.instruction_tokens[self.target_index]
         self.perfect_trajectory = self.get_perfect_trajectory(self.target_instruction)
+        self.scan_rows = self.image_data.scan_rows(self.target_instruction.scan)
+        self._pin_scan(self.target_instruction.scan)
 
         self.update_current_observation()
         return self.current_observation
@@ -0,0 +1,112 @@
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+from avp_env.dataLoder.assets import get_assets
+from avp_env.envs.avp_env import MetricsEnv
+
+# Per-process env, agent and episode function, set up once by _init_worker
+_worker = {}
+
+
+def run_episode(env, agent, instruction_index):
+    """Drive one test instruction to the end and return the ParkingID the agent stopped at ([] for none)."""
+    env.reset(instruction_index)
+
+    done = False
+    perfect_trajectory = env.get_perfect_traj()
+    while not done:
+        action = agent.get_action(perfect_trajectory, env.get_position())
+        observation, reward, done, info = env.step(action)
+
+    last_slots = env.get_current_parking_slot()
+    return last_slots[0].ParkingID if last_slots else []
+
+
+def _seed_episode(agent, seed, instruction_index):
+    # Seeding per instruction keeps the results independent of the worker count and shard layout
+    episode_seed = seed * 1000003 + instruction_index
+    random.seed(episode_seed)
+    np.random.seed(episode_seed % 2 ** 32)
+    action_space = getattr(agent, "action_space", None)
+    if action_space is not None:
+        action_space.seed(episode_seed)
+
+
+def _init_worker(env_type, agent_factory, episode_fn, seed):
+    # get_assets returns the parent's preloaded assets when forked, and loads them once per worker otherwise
+    env = MetricsEnv(env_type, headless=True)
+    _worker.update(env=env, agent=agent_factory(), episode_fn=episode_fn, seed=seed)
+
+
+def _run_instruction(instruction_index):
+    env, agent = _worker["env"], _worker["agent"]
+    if _worker["seed"] is not None:
+        _seed_episode(agent, _worker["seed"], instruction_index)
+    result_id = _worker["episode_fn"](env, agent, instruction_index)
+    return {
+        "TestScenarioID": env.get_scan(),
+        "TestInstructionID": instruction_index,
+        "VLPDecisionPositionID": result_id
+    }
+
+
+class EvaluationRunner:
+    """Run test instructions through MetricsEnv on a process pool.
+
+    agent_factory and episode_fn must be picklable (module-level callables); each worker builds its own agent
+    and env once. Instruction indices are split into contiguous chunks, and the experiments come back in
+    instruction order, exactly as a sequential run would list them.
+    """
+
+    def __init__(self, agent_factory, env_type='test', num_workers=None, episode_fn=run_episode,
+                 seed=None, chunk_size=None, context=None):
+        self.agent_factory = agent_factory
+        self.env_type = env_type
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.episode_fn = episode_fn
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.context = multiprocessing.get_context(context)
+        self.stats = {}
+
+        # Loaded before the pool starts so forked workers share these pages instead of decoding again
+        self.assets = get_assets(env_type, (128, 400, 3), 64, headless=True)
+
+    def _chunk_size(self, num_instructions):
+        if self.chunk_size:
+            return self.chunk_size
+        # A few chunks per worker balances uneven episode lengths without much IPC
+        return max(1, num_instructions // (self.num_workers * 4))
+
+    def run(self, num_instructions=None):
+        if num_instructions is None:
+            num_instructions = len(self.assets.trajectories)
+        instruction_indices = range(num_instructions)
+
+        start_time = time.perf_counter()
+        if self.num_workers == 1:
+            _init_worker(self.env_type, self.agent_factory, self.episode_fn, self.seed)
+            experiments = [_run_instruction(index) for index in instruction_indices]
+        else:
+            with self.context.Pool(self.num_workers, initializer=_init_worker,
+                                   initargs=(self.env_type, self.agent_factory, self.episode_fn, self.seed)) as pool:
+                experiments = pool.map(_run_instruction, instruction_indices, self._chunk_size(num_instructions))
+        elapsed = time.perf_counter() - start_time
+
+        self.stats = {
+            "episodes": num_instructions,
+            "workers": self.num_workers,
+            "seconds": elapsed,
+            "episodes_per_sec": num_instructions / elapsed if elapsed > 0 else float("inf"),
+        }
+        print(f"Evaluated {num_instructions} episodes with {self.num_workers} workers in {elapsed:.2f}s "
+              f"({self.stats['episodes_per_sec']:.1f} episodes/s)")
+        return experiments
+
+
+def evaluate(agent_factory, env_type='test', num_instructions=None, num_workers=None, **kwargs):
+    """Shortcut for EvaluationRunner(...).run(num_instructions)."""
+    return EvaluationRunner(agent_factory, env_type, num_workers, **kwargs).run(num_instructions)
@@ -0,0 +1,119 @@
+import queue
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class EpisodePrefetcher:
+    """Draw the next `depth` episode targets ahead of time and warm their frames on a background thread.
+
+    next_target() hands out targets in draw order, so the sequence of episodes is the same as drawing at
+    reset time. With a ShardedImageStore warming loads the scenario's shard; with an eager store it
+    touches the rows so the pages of a memory-mapped cache file are read in before reset needs them.
+    A shard is only warmed once it fits in the memory budget next to the pinned shards (the running
+    episode's and those reserved for earlier upcoming episodes); it is pinned until its episode starts,
+    so a warm-up never evicts a shard that is in use or still to be used. Warm-ups that do not fit yet
+    are postponed to a later episode start. An episode counts as a hit when its frames are resident at
+    the moment it starts reading them.
+    """
+
+    def __init__(self, image_store, trajectories, draw_target, depth):
+        self.image_store = image_store
+        self.trajectories = trajectories
+        self.draw_target = draw_target
+        self.depth = depth
+        # [target_index, reserved] per drawn episode, in draw order
+        self.upcoming = deque()
+        self._current = None
+        self.stats = {"hits": 0, "misses": 0, "warmed": 0, "postponed": 0}
+        self._warm_scans = set()
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="EpisodePrefetcher", daemon=True)
+        self._thread.start()
+
+    def _is_warm(self, scan):
+        if hasattr(self.image_store, "is_resident"):
+            return self.image_store.is_resident(scan)
+        return scan in self._warm_scans
+
+    def _reserve(self, scan):
+        if hasattr(self.image_store, "pin"):
+            return self.image_store.pin(scan, if_fits=True)
+        return True
+
+    def _release(self, scan):
+        if hasattr(self.image_store, "unpin"):
+            self.image_store.unpin(scan)
+
+    def _warm(self, scan):
+        if self._is_warm(scan):
+            return
+        if hasattr(self.image_store, "is_pinned") and not self.image_store.is_pinned(scan):
+            # Its episodes started (and ended) before the request was reached, so loading it now only evicts
+            return
+        if hasattr(self.image_store, "shard"):
+            self.image_store.shard(scan)
+        else:
+            rows = self.image_store.scan_rows(scan)
+            np.take(self.image_store.images, rows[rows >= 0], axis=0)
+            self._warm_scans.add(scan)
+        self.stats["warmed"] += 1
+
+    def _run(self):
+        while True:
+            scan = self._requests.get()
+            if scan is None:
+                break
+            try:
+                self._warm(scan)
+            except Exception as e:  # nosec
+                # A failed warm-up only costs a miss; reset loads the frames itself and reports the error
+                print(f"Prefetching {scan} failed: {e}")
+
+    def _fill(self):
+        while len(self.upcoming) < self.depth + 1:
+            self.upcoming.append([self.draw_target(), False])
+
+    def _schedule(self):
+        """Reserve and queue warm-ups in episode order, stopping at the first that does not fit yet."""
+        self._fill()
+        for entry in self.upcoming:
+            if entry[1]:
+                continue
+            scan = self.trajectories[entry[0]].scan
+            if not self._reserve(scan):
+                self.stats["postponed"] += 1
+                break
+            entry[1] = True
+            self._requests.put(scan)
+
+    def next_target(self):
+        """The next episode's target; call start_episode() once its scenario is pinned as the active one."""
+        self._schedule()
+        target_index, reserved = self.upcoming.popleft()
+        self._current = (target_index, reserved)
+        return target_index
+
+    def start_episode(self):
+        """Count the episode returned by next_target() as a hit or miss and warm the upcoming ones."""
+        target_index, reserved = self._current
+        scan = self.trajectories[target_index].scan
+        if self._is_warm(scan):
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+        if reserved:
+            # The running episode holds its own pin from here on
+            self._release(scan)
+        # Start warming the next targets while this episode runs
+        self._schedule()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._requests.put(None)
+            self._thread.join(timeout=5)
+        for target_index, reserved in self.upcoming:
+            if reserved:
+                self._release(self.trajectories[target_index].scan)
+        self.upcoming.clear()
@@ -0,0 +1,33 @@
+import random
+
+
+class ScenarioSampler:
+    """Draw target trajectories in runs of `episodes_per_scenario` episodes from the same scenario.
+
+    Scenarios are picked with probability proportional to their trajectory count, so every trajectory
+    is still drawn uniformly overall while consecutive episodes reuse the frames already loaded.
+    """
+
+    def __init__(self, trajectories, episodes_per_scenario, rng=None):
+        if episodes_per_scenario < 1:
+            raise ValueError(f"episodes_per_scenario must be at least 1, got {episodes_per_scenario}")
+        self.episodes_per_scenario = episodes_per_scenario
+        # The env's random module by default, so random.seed() keeps episodes reproducible
+        self.rng = rng or random
+        self.scan_trajectories = {}
+        for index, trajectory in enumerate(trajectories):
+            self.scan_trajectories.setdefault(trajectory.scan, []).append(index)
+        self.scans = list(self.scan_trajectories)
+        self.weights = [len(self.scan_trajectories[scan]) for scan in self.scans]
+        self.current_scan = None
+        self.remaining = 0
+
+    def next_scan(self):
+        return self.rng.choices(self.scans, weights=self.weights)[0]
+
+    def sample(self):
+        if self.remaining == 0:
+            self.current_scan = self.next_scan()
+            self.remaining = self.episodes_per_scenario
+        self.remaining -= 1
+        return self.rng.choice(self.scan_trajectories[self.current_scan])
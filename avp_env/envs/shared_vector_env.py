@@ -0,0 +1,179 @@
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from avp_env.envs.vector_env import AutonomousParkingVectorEnv, EpisodeBatch
+
+
+class SharedArray:
+    """A NumPy array living in a named shared memory block that other processes can attach to."""
+
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self.owner = name is None
+        if self.owner:
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            # Workers share the parent's resource tracker, so attaching never takes ownership of the block
+            self.shm = SharedMemory(name=name)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def copy_of(cls, array):
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    def spec(self):
+        """Picklable description used to attach from another process."""
+        return self.shm.name, self.shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name=name)
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker(pipe, kernel, images_spec, tokens, image_buffer_spec, token_buffer_spec, env_slice, seed):
+    images = SharedArray.attach(images_spec)
+    image_buffer = SharedArray.attach(image_buffer_spec)
+    token_buffer = SharedArray.attach(token_buffer_spec)
+    # The worker writes its envs' observations straight into the parent's batch buffers
+    episodes = EpisodeBatch(kernel, images.array, tokens,
+                            image_buffer.array[env_slice], token_buffer.array[env_slice], seed)
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == "reset":
+                episodes.reset(data)
+                pipe.send((episodes.positions, episodes.target_indices))
+            elif command == "step":
+                rewards, dones, info = episodes.step(data)
+                pipe.send((rewards, dones, info, episodes.positions, episodes.target_indices))
+            elif command == "close":
+                break
+    finally:
+        for shared in (images, image_buffer, token_buffer):
+            shared.close()
+        pipe.close()
+
+
+class SharedMemoryVectorEnv(AutonomousParkingVectorEnv):
+    """AutonomousParkingVectorEnv whose envs are stepped by worker processes.
+
+    The image tensor is copied once into shared memory and every worker attaches to it without copying.
+    Workers write observations into a shared batch buffer, so only actions, indices and rewards travel
+    through the pipes and memory stays roughly flat as the worker count grows.
+    """
+
+    def __init__(self, num_envs, env_type='train', seed=None, copy=True, num_workers=None, context=None):
+        self.num_workers = min(num_workers or multiprocessing.cpu_count(), num_envs)
+        self.context = multiprocessing.get_context(context)
+        super(SharedMemoryVectorEnv, self).__init__(num_envs, env_type, seed, copy)
+
+    def _make_episodes(self, seed):
+        self.shared_images = SharedArray.copy_of(self.image_data.images)
+        self.image_buffer = SharedArray((self.num_envs,) + self.image_shape, np.uint8)
+        self.token_buffer = SharedArray((self.num_envs, self.max_string_length), np.int64)
+
+        # Contiguous shards of env ids, one per worker, each with its own random stream
+        bounds = np.linspace(0, self.num_envs, self.num_workers + 1).astype(int)
+        self.env_slices = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        seeds = np.random.SeedSequence(seed).spawn(self.num_workers)
+
+        self.pipes = []
+        self.processes = []
+        for env_slice, worker_seed in zip(self.env_slices, seeds):
+            parent_pipe, child_pipe = self.context.Pipe()
+            process = self.context.Process(
+                target=_worker,
+                args=(child_pipe, self.kernel, self.shared_images.spec(), self.instruction_tokens.tokens,
+                      self.image_buffer.spec(), self.token_buffer.spec(), env_slice, worker_seed),
+                daemon=True
+            )
+            process.start()
+            child_pipe.close()
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+
+        self._positions = np.ones(self.num_envs, dtype=np.int64)
+        self._target_indices = np.zeros(self.num_envs, dtype=np.int64)
+        return None
+
+    @property
+    def positions(self):
+        return self._positions
+
+    @property
+    def target_indices(self):
+        return self._target_indices
+
+    def _observation(self):
+        if self.copy:
+            return self.image_buffer.array.copy(), self.token_buffer.array.copy()
+        # Without copying, the returned arrays are updated in place by the next call
+        return self.image_buffer.array, self.token_buffer.array
+
+    def reset(self, seed=None):
+        seeds = np.random.SeedSequence(seed).spawn(self.num_workers) if seed is not None \
+            else [None] * self.num_workers
+        for pipe, worker_seed in zip(self.pipes, seeds):
+            pipe.send(("reset", worker_seed))
+        for pipe, env_slice in zip(self.pipes, self.env_slices):
+            self._positions[env_slice], self._target_indices[env_slice] = pipe.recv()
+        return self._observation()
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        for pipe, env_slice in zip(self.pipes, self.env_slices):
+            pipe.send(("step", actions[env_slice]))
+
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        info = {
+            "target_index": np.zeros(self.num_envs, dtype=np.int64),
+            "parking_slot_row": np.zeros(self.num_envs, dtype=np.int64),
+        }
+        for pipe, env_slice in zip(self.pipes, self.env_slices):
+            worker_rewards, worker_dones, worker_info, positions, target_indices = pipe.recv()
+            rewards[env_slice] = worker_rewards
+            dones[env_slice] = worker_dones
+            for key, value in worker_info.items():
+                info[key][env_slice] = value
+            self._positions[env_slice] = positions
+            self._target_indices[env_slice] = target_indices
+        return self._observation(), rewards, dones, info
+
+    def close(self):
+        if not self.processes:
+            return
+        for pipe in self.pipes:
+            try:
+                pipe.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for pipe in self.pipes:
+            pipe.close()
+        self.pipes = []
+        self.processes = []
+        for shared in (self.shared_images, self.image_buffer, self.token_buffer):
+            shared.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:  # nosec
+            pass
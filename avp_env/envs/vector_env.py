@@ -0,0 +1,182 @@
+import numpy as np
+from gymnasium import spaces
+from gymnasium.vector.utils import batch_space
+
+from avp_env.common import Trajectory
+from avp_env.dataLoder.assets import get_assets
+from avp_env.envs.avp_env import LAST_POSITION
+
+
+class EpisodeKernel:
+    """Array-only episode logic of AutonomousParkingEnv, stepping any number of episodes per call.
+
+    It only holds small integer tables (no images or tokenizer), so it is cheap to copy into other processes.
+    """
+
+    def __init__(self, image_store, slot_index, reward_engine, trajectories):
+        traj_scans = np.array([image_store.scan_index[trajectory.scan] for trajectory in trajectories], dtype=np.int64)
+        # Image row of every (trajectory, position) and deciding slot row of every (trajectory, position, action)
+        self.image_rows = image_store.row_table[traj_scans]
+        self.slot_rows = slot_index.row_grid(image_store.scans, min_path_id=LAST_POSITION)[traj_scans]
+        self.reward_engine = reward_engine
+        self.num_trajectories = len(trajectories)
+
+    def observation_rows(self, trajectory_rows, positions):
+        rows = self.image_rows[trajectory_rows, positions]
+        if np.any(rows < 0):
+            raise KeyError(f"No image for positions {positions[rows < 0]} of trajectories {trajectory_rows[rows < 0]}")
+        return rows
+
+    def step(self, trajectory_rows, positions, actions):
+        """Advance episodes in place; returns (rewards, dones, parked slot rows) with -1 for no slot."""
+        overflow = positions > LAST_POSITION
+        forward = (actions == 0) & ~overflow
+        move = forward & (positions != LAST_POSITION)
+        park = (actions != 0) & ~overflow
+
+        rewards = np.zeros(len(positions), dtype=np.float64)
+        rewards[overflow | (forward & ~move)] = -1.0
+
+        slot_rows = np.full(len(positions), -1, dtype=np.int64)
+        parked = np.flatnonzero(park)
+        if len(parked) == 0:
+            positions[move] += 1
+            return rewards, ~move, slot_rows
+        # Actions outside the slot grid name a location that has no slot
+        in_grid = (actions[parked] < self.slot_rows.shape[2]) & (actions[parked] > 0) \
+            & (positions[parked] < self.slot_rows.shape[1])
+        lookup = parked[in_grid]
+        slot_rows[lookup] = self.slot_rows[trajectory_rows[lookup], positions[lookup], actions[lookup]]
+        rewards[parked] = self.reward_engine.rewards(slot_rows[parked], trajectory_rows[parked])
+
+        positions[move] += 1
+        return rewards, ~move, slot_rows
+
+
+class EpisodeBatch:
+    """Episode state of a batch of envs, writing the observations of changed envs into the given buffers.
+
+    Finished episodes are reset automatically; the buffered observation of such an env is the first one of
+    its new episode. Like AutonomousParkingEnv.step, moving forward keeps the previous frame and parking
+    refreshes it.
+    """
+
+    def __init__(self, kernel, images, tokens, image_buffer, token_buffer, seed=None):
+        self.kernel = kernel
+        self.images = images
+        self.tokens = tokens
+        self.image_buffer = image_buffer
+        self.token_buffer = token_buffer
+        self.rng = np.random.default_rng(seed)
+
+        num_envs = len(image_buffer)
+        self.positions = np.ones(num_envs, dtype=np.int64)
+        self.target_indices = np.zeros(num_envs, dtype=np.int64)
+        self.observation_rows = np.zeros(num_envs, dtype=np.int64)
+
+    def _update_observations(self, env_ids):
+        # Only envs whose frame or instruction changed are gathered into the batch buffers
+        self.observation_rows[env_ids] = self.kernel.observation_rows(
+            self.target_indices[env_ids], self.positions[env_ids])
+        self.image_buffer[env_ids] = np.take(self.images, self.observation_rows[env_ids], axis=0)
+        self.token_buffer[env_ids] = self.tokens[self.target_indices[env_ids]]
+
+    def _reset_envs(self, env_ids):
+        self.positions[env_ids] = 1
+        self.target_indices[env_ids] = self.rng.integers(self.kernel.num_trajectories, size=len(env_ids))
+        self._update_observations(env_ids)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_envs(np.arange(len(self.positions)))
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        parking = np.flatnonzero((actions != 0) & (self.positions <= LAST_POSITION))
+        rewards, dones, slot_rows = self.kernel.step(self.target_indices, self.positions, actions)
+
+        # Parking refreshes the frame at the current position
+        if len(parking):
+            self._update_observations(parking)
+
+        info = {
+            "target_index": self.target_indices.copy(),
+            "parking_slot_row": slot_rows,
+        }
+        done_ids = np.flatnonzero(dones)
+        if len(done_ids):
+            self._reset_envs(done_ids)
+        return rewards, dones, info
+
+
+class AutonomousParkingVectorEnv:
+    """N AutonomousParkingEnv episodes held as arrays and stepped with one call (see EpisodeBatch)."""
+
+    def __init__(self, num_envs, env_type='train', seed=None, copy=True):
+        self.num_envs = num_envs
+        self.env_type = env_type
+        self.image_shape = (128, 400, 3)
+        self.max_string_length = 64
+        self.copy = copy
+
+        # Heavy assets are shared with every scalar env of the same configuration in this process
+        self.assets = get_assets(self.env_type, self.image_shape, self.max_string_length, headless=True)
+        self.image_data = self.assets.image_loader.observations
+        self.instruction_tokens = self.assets.instruction_tokens
+        self.trajectories = self.assets.trajectories
+        self.kernel = EpisodeKernel(self.image_data, self.assets.slot_index, self.assets.reward_engine,
+                                    self.trajectories)
+
+        self.single_observation_space = spaces.Tuple((
+            spaces.Box(low=0, high=255, shape=self.image_shape, dtype=np.uint8),
+            spaces.Box(low=0, high=99999, shape=(self.max_string_length,), dtype=np.int64)
+        ))
+        self.single_action_space = spaces.Discrete(7)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        self.path_ids = Trajectory.column(self.trajectories, "path_id", LAST_POSITION + 1, np.int64)
+        self.loc_ids = Trajectory.column(self.trajectories, "loc_id", 0, np.int64)
+
+        self.episodes = self._make_episodes(seed)
+
+    def _make_episodes(self, seed):
+        image_buffer = np.zeros((self.num_envs,) + self.image_shape, dtype=np.uint8)
+        token_buffer = np.zeros((self.num_envs, self.max_string_length), dtype=np.int64)
+        return EpisodeBatch(self.kernel, self.image_data.images, self.instruction_tokens.tokens,
+                            image_buffer, token_buffer, seed)
+
+    @property
+    def positions(self):
+        return self.episodes.positions
+
+    @property
+    def target_indices(self):
+        return self.episodes.target_indices
+
+    def _observation(self):
+        image_buffer, token_buffer = self.episodes.image_buffer, self.episodes.token_buffer
+        if self.copy:
+            return image_buffer.copy(), token_buffer.copy()
+        # Without copying, the returned arrays are updated in place by the next call
+        return image_buffer, token_buffer
+
+    def reset(self, seed=None):
+        self.episodes.reset(seed)
+        return self._observation()
+
+    def step(self, actions):
+        rewards, dones, info = self.episodes.step(actions)
+        return self._observation(), rewards, dones, info
+
+    def get_positions(self):
+        return self.positions.copy()
+
+    def get_perfect_actions(self):
+        """Optimal action of every env at its current position, following get_perfect_trajectory."""
+        at_target = self.positions == self.path_ids[self.target_indices]
+        return np.where(at_target, self.loc_ids[self.target_indices], 0)
+
+    def close(self):
+        pass
@@ -0,0 +1,217 @@
+import os
+
+import h5py
+import numpy as np
+
+
+class SupervisedDatasetWriter:
+    """Stream (image, instruction, action) samples into resizable, chunked HDF5 datasets.
+
+    Samples are buffered in preallocated arrays and appended batch_size at a time, so memory stays bounded
+    whatever the number of episodes. Only whole episodes count as written: the file records how many
+    episodes and samples were complete, and resume=True truncates anything after that and continues from there.
+    """
+
+    def __init__(self, path, image_shape, max_string_length, batch_size=1024, compression=None,
+                 chunk_rows=16, resume=False):
+        self.path = path
+        self.image_shape = tuple(image_shape)
+        self.max_string_length = max_string_length
+        self.batch_size = batch_size
+
+        mode = 'a' if resume and os.path.exists(path) else 'w'
+        self.file = h5py.File(path, mode)
+        if 'images' not in self.file:
+            self._create_datasets(compression, chunk_rows)
+        self.images = self.file['images']
+        self.instructions = self.file['instructions']
+        self.actions = self.file['actions']
+
+        # Drop the samples of an episode that was interrupted before it finished
+        self.episodes = int(self.file.attrs.get('episodes', 0))
+        self.num_samples = int(self.file.attrs.get('num_samples', 0))
+        self._resize(self.num_samples)
+        self.episode_start = self.num_samples
+
+        self.image_buffer = np.zeros((batch_size,) + self.image_shape, dtype=np.uint8)
+        self.instruction_buffer = np.zeros((batch_size, max_string_length), dtype=np.int64)
+        self.action_buffer = np.zeros(batch_size, dtype=np.int64)
+        self.buffered = 0
+
+    def _create_datasets(self, compression, chunk_rows):
+        self.file.create_dataset('images', shape=(0,) + self.image_shape, maxshape=(None,) + self.image_shape,
+                                 dtype=np.uint8, chunks=(chunk_rows,) + self.image_shape, compression=compression)
+        self.file.create_dataset('instructions', shape=(0, self.max_string_length),
+                                 maxshape=(None, self.max_string_length), dtype=np.int64,
+                                 chunks=(chunk_rows * 64, self.max_string_length), compression=compression)
+        self.file.create_dataset('actions', shape=(0,), maxshape=(None,), dtype=np.int64,
+                                 chunks=(chunk_rows * 1024,), compression=compression)
+
+    def _resize(self, num_rows):
+        for dataset in (self.images, self.instructions, self.actions):
+            dataset.resize(num_rows, axis=0)
+
+    def __len__(self):
+        return self.num_samples + self.buffered
+
+    def append(self, image, instruction, action):
+        row = self.buffered
+        self.image_buffer[row] = image
+        self.instruction_buffer[row] = instruction
+        self.action_buffer[row] = action
+        self.buffered += 1
+        if self.buffered == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffered:
+            return
+        start, stop = self.num_samples, self.num_samples + self.buffered
+        self._resize(stop)
+        self.images[start:stop] = self.image_buffer[:self.buffered]
+        self.instructions[start:stop] = self.instruction_buffer[:self.buffered]
+        self.actions[start:stop] = self.action_buffer[:self.buffered]
+        self.num_samples = stop
+        self.buffered = 0
+        # Everything up to the last finished episode is on disk now, so a resume can start from there
+        self._commit()
+
+    def end_episode(self):
+        """Mark every sample appended so far as part of a finished episode."""
+        self.episodes += 1
+        self.episode_start = len(self)
+
+    def _commit(self):
+        self.file.attrs['episodes'] = self.episodes
+        self.file.attrs['num_samples'] = self.episode_start
+        self.file.flush()
+
+    def close(self):
+        if self.file is None:
+            return
+        # Samples of an unfinished episode are discarded so the file ends on an episode boundary
+        self.flush()
+        self._resize(self.episode_start)
+        self.num_samples = self.episode_start
+        self._commit()
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ReferenceDatasetWriter:
+    """Write samples as (image_index, instruction_index, action) references into deduplicated tables.
+
+    Every distinct frame and instruction is stored once, in the order it was first referenced, in the
+    'images' and 'instructions' datasets; 'image_index', 'instruction_index' and 'actions' hold one row per
+    sample. image_store is an ImageStore and tokens the (num_trajectories, max_string_length) token table.
+    """
+
+    def __init__(self, path, image_store, tokens, batch_size=65536, compression=None):
+        self.path = path
+        self.image_store = image_store
+        self.tokens = np.asarray(tokens)
+        self.batch_size = batch_size
+        self.compression = compression
+
+        self.file = h5py.File(path, 'w')
+        self.sample_columns = {}
+        for name in ('image_index', 'instruction_index', 'actions'):
+            self.sample_columns[name] = self.file.create_dataset(
+                name, shape=(0,), maxshape=(None,), dtype=np.int64,
+                chunks=(min(batch_size, 65536),), compression=compression)
+        self.buffer = np.zeros((3, batch_size), dtype=np.int64)
+        self.buffered = 0
+        self.num_samples = 0
+
+        # Source row -> table index, filled in first-reference order
+        self.image_rows = {}
+        self.instruction_rows = {}
+
+    def __len__(self):
+        return self.num_samples + self.buffered
+
+    def append(self, image_row, instruction_row, action):
+        """Add a sample by its ImageStore row and token table row."""
+        image_index = self.image_rows.setdefault(image_row, len(self.image_rows))
+        instruction_index = self.instruction_rows.setdefault(instruction_row, len(self.instruction_rows))
+        self.buffer[:, self.buffered] = (image_index, instruction_index, action)
+        self.buffered += 1
+        if self.buffered == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffered:
+            return
+        start, stop = self.num_samples, self.num_samples + self.buffered
+        for values, dataset in zip(self.buffer, self.sample_columns.values()):
+            dataset.resize(stop, axis=0)
+            dataset[start:stop] = values[:self.buffered]
+        self.num_samples = stop
+        self.buffered = 0
+
+    def _write_table(self, name, source_rows, take):
+        rows = np.fromiter(source_rows, dtype=np.int64, count=len(source_rows))
+        first = take(rows[:0])
+        dataset = self.file.create_dataset(name, shape=(len(rows),) + first.shape[1:], dtype=first.dtype,
+                                           compression=self.compression)
+        # Gathered a batch at a time so even a large image table is never held twice
+        step = 256
+        for start in range(0, len(rows), step):
+            dataset[start:start + step] = take(rows[start:start + step])
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        # Dicts keep insertion order, so table index i holds the i-th distinct row referenced
+        self._write_table('images', self.image_rows, self.image_store.take)
+        self._write_table('instructions', self.instruction_rows, lambda rows: self.tokens[rows])
+        self.file.attrs['num_samples'] = self.num_samples
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ReferenceDataset:
+    """Read a file written by ReferenceDatasetWriter and rehydrate (images, instructions, actions) batches."""
+
+    def __init__(self, path, in_memory=True):
+        self.file = h5py.File(path, 'r')
+        # The tables are small (one row per distinct frame/instruction), so they are read into memory by default
+        self.images = self.file['images'][...] if in_memory else self.file['images']
+        self.instructions = self.file['instructions'][...]
+        self.image_index = self.file['image_index'][...]
+        self.instruction_index = self.file['instruction_index'][...]
+        self.actions = self.file['actions'][...]
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __getitem__(self, indices):
+        image_index = self.image_index[indices]
+        if isinstance(self.images, np.ndarray):
+            images = self.images[image_index]
+        else:
+            # h5py needs increasing unique indices, so read those and expand afterwards
+            unique_index, inverse = np.unique(image_index, return_inverse=True)
+            images = self.images[unique_index][inverse.reshape(np.shape(image_index))]
+        return images, self.instructions[self.instruction_index[indices]], self.actions[indices]
+
+    def iter_batches(self, batch_size, shuffle=False, seed=None):
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(order), batch_size):
+            yield self[order[start:start + batch_size]]
+
+    def close(self):
+        self.file.close()
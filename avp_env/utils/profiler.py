@@ -0,0 +1,133 @@
+import functools
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class CallTimer:
+    """Call count, total time and a ring buffer of the latest durations for percentiles."""
+
+    def __init__(self, window):
+        self.calls = 0
+        self.total = 0.0
+        self.durations = np.zeros(window, dtype=np.float64)
+
+    def record(self, seconds):
+        self.durations[self.calls % len(self.durations)] = seconds
+        self.calls += 1
+        self.total += seconds
+
+    def stats(self):
+        recent = self.durations[:min(self.calls, len(self.durations))]
+        if not len(recent):
+            return {"calls": 0, "total_s": 0.0}
+        p50, p90, p99 = np.percentile(recent, [50, 90, 99]) * 1e6
+        return {
+            "calls": self.calls,
+            "total_s": self.total,
+            "mean_us": self.total / self.calls * 1e6,
+            "p50_us": p50,
+            "p90_us": p90,
+            "p99_us": p99,
+            "max_us": recent.max() * 1e6,
+        }
+
+
+class Profiler:
+    """Opt-in timing of selected methods of live objects.
+
+    instrument() shadows the methods with timed wrappers on the instance only, and restore() removes them,
+    so nothing is added to the call path of objects that are not instrumented. Percentiles cover the
+    latest `window` calls of each method. With dump_path set, a text report is rewritten every
+    dump_interval seconds from the instrumented calls themselves (no background thread).
+    """
+
+    def __init__(self, window=10000, dump_path=None, dump_interval=60.0):
+        self.window = window
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.timers = {}
+        self.phases = {}
+        self.instrumented = []
+        self.lock = threading.Lock()
+        self.next_dump = time.monotonic() + dump_interval
+
+    def _timer(self, name):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = CallTimer(self.window)
+        return timer
+
+    def instrument(self, obj, method_names, prefix=""):
+        for method_name in method_names:
+            if method_name in vars(obj):
+                # Already instrumented (or shadowed by the caller), leave it alone
+                continue
+            method = getattr(obj, method_name)
+            setattr(obj, method_name, self._wrap(method, prefix + method_name))
+            self.instrumented.append((obj, method_name, prefix))
+
+    def _wrap(self, method, name):
+        timer = self._timer(name)
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timer.record(time.perf_counter() - start_time)
+                if self.dump_path is not None and time.monotonic() >= self.next_dump:
+                    self.dump()
+        return timed
+
+    def restore(self):
+        for obj, method_name, _ in self.instrumented:
+            vars(obj).pop(method_name, None)
+        self.instrumented = []
+
+    def add_phases(self, name, phases):
+        """Attach one-off timings, such as the stages of a loader, to the report."""
+        self.phases[name] = dict(phases)
+
+    def stats(self):
+        return {
+            "calls": {name: timer.stats() for name, timer in self.timers.items()},
+            "phases": {name: dict(phases) for name, phases in self.phases.items()},
+        }
+
+    def report(self):
+        lines = [f"{'method':32s} {'calls':>10s} {'total s':>10s} {'mean us':>10s} "
+                 f"{'p50 us':>10s} {'p90 us':>10s} {'p99 us':>10s}"]
+        for name, stats in sorted(self.stats()["calls"].items()):
+            if stats["calls"]:
+                lines.append(f"{name:32s} {stats['calls']:10d} {stats['total_s']:10.3f} {stats['mean_us']:10.1f} "
+                             f"{stats['p50_us']:10.1f} {stats['p90_us']:10.1f} {stats['p99_us']:10.1f}")
+        for name, phases in sorted(self.phases.items()):
+            lines.append(f"{name}: " + ", ".join(
+                f"{phase}={value:.4f}" if isinstance(value, float) else f"{phase}={value}"
+                for phase, value in phases.items()))
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        path = path or self.dump_path
+        with self.lock:
+            self.next_dump = time.monotonic() + self.dump_interval
+            report = self.report()
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(report + "\n")
+            # Replaced atomically so a reader never sees a half-written report
+            os.replace(tmp_path, path)
+
+    def reset(self):
+        self.timers = {}
+        self.phases = {}
+        # Existing wrappers keep their timers, so re-create them for the methods still instrumented
+        instrumented = self.instrumented
+        self.restore()
+        for obj, method_name, prefix in instrumented:
+            self.instrument(obj, [method_name], prefix)
+
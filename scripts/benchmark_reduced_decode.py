@@ -0,0 +1,120 @@
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from avp_env.dataLoder.image import _decode_image, jpeg_size, reduced_read_flag, REDUCED_READ_FLAGS
+from avp_env.dataLoder.path import PathLoader
+
+IMAGE_SHAPE = (128, 400, 3)
+
+
+def dji_metadata(orientation):
+    """APP1 segments laid out like a DJI frame: Exif with the given orientation, then an XMP packet."""
+    tiff = (b'MM\x00\x2a' + (8).to_bytes(4, 'big') + (1).to_bytes(2, 'big')
+            + (0x0112).to_bytes(2, 'big') + (3).to_bytes(2, 'big') + (1).to_bytes(4, 'big')
+            + orientation.to_bytes(2, 'big') + b'\x00\x00' + (0).to_bytes(4, 'big'))
+    xmp = b'http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta xmlns:x="adobe:ns:meta/"><drone-dji:Version>1</x:xmpmeta>'
+    return b''.join(b'\xff\xe1' + (len(segment) + 2).to_bytes(2, 'big') + segment
+                    for segment in (b'Exif\x00\x00' + tiff, xmp))
+
+
+def make_synthetic_frames(directory, count, native_shape, seed=0, orientation=None):
+    """Smooth, drone-like test frames (gradients, blocks and mild noise) saved as JPEGs.
+
+    With orientation set, each frame gets DJI-style Exif (with that orientation) and XMP segments.
+    """
+    rng = np.random.default_rng(seed)
+    height, width = native_shape
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    filepaths = []
+    for i in range(count):
+        image = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=-1)
+        for _ in range(40):
+            top, left = rng.integers(0, height - 50), rng.integers(0, width - 50)
+            image[top:top + rng.integers(20, 400), left:left + rng.integers(20, 400)] = rng.integers(0, 255, 3)
+        image += rng.normal(0, 6, image.shape)
+        filepath = os.path.join(directory, f"DJI_{i + 1:02d}.JPG")
+        cv2.imwrite(filepath, np.clip(image, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if orientation is not None:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            with open(filepath, 'wb') as f:
+                f.write(data[:2] + dji_metadata(orientation) + data[2:])
+        filepaths.append(filepath)
+    return filepaths
+
+
+def time_decode(filepaths, reduced_decode, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        images = [_decode_image(filepath, IMAGE_SHAPE, cv2.INTER_AREA, reduced_decode) for filepath in filepaths]
+        best = min(best, time.perf_counter() - start_time)
+    return images, best
+
+
+def psnr(reference, image):
+    mse = np.mean((reference.astype(np.float64) - image.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def check_headers(filepaths):
+    """The header size must be the shape cv2.imread returns, or the reduction factor is chosen on the wrong axes."""
+    for filepath in filepaths:
+        decoded_size = cv2.imread(filepath).shape[:2]
+        if jpeg_size(filepath) not in (None, decoded_size):
+            raise AssertionError(f"jpeg_size gives {jpeg_size(filepath)} for {filepath}, cv2.imread {decoded_size}")
+        flag = reduced_read_flag(jpeg_size(filepath), IMAGE_SHAPE)
+        if flag is not None:
+            reduced_size = cv2.imread(filepath, flag).shape[:2]
+            if reduced_size[0] < IMAGE_SHAPE[0] or reduced_size[1] < IMAGE_SHAPE[1]:
+                raise AssertionError(f"Reduced decode of {filepath} gives {reduced_size}, smaller than {IMAGE_SHAPE}")
+
+
+def run(filepaths, repeats):
+    check_headers(filepaths)
+    factors = {flag: factor for factor, flag in REDUCED_READ_FLAGS}
+    chosen = [factors.get(reduced_read_flag(jpeg_size(filepath), IMAGE_SHAPE), 1) for filepath in filepaths]
+    full_images, full_seconds = time_decode(filepaths, False, repeats)
+    reduced_images, reduced_seconds = time_decode(filepaths, True, repeats)
+
+    # Fidelity of the reduced path against the current full-resolution decode + INTER_AREA resize
+    errors = np.array([np.abs(full.astype(np.int16) - reduced.astype(np.int16)).mean()
+                       for full, reduced in zip(full_images, reduced_images)])
+    max_errors = np.array([np.abs(full.astype(np.int16) - reduced.astype(np.int16)).max()
+                           for full, reduced in zip(full_images, reduced_images)])
+    psnrs = np.array([psnr(full, reduced) for full, reduced in zip(full_images, reduced_images)])
+
+    print(f"{len(filepaths)} frames, native size {jpeg_size(filepaths[0])}, reduction factors used: "
+          f"{sorted(set(chosen))}")
+    print(f"full decode   : {len(filepaths) / full_seconds:8.1f} images/s")
+    print(f"reduced decode: {len(filepaths) / reduced_seconds:8.1f} images/s "
+          f"(speedup {full_seconds / reduced_seconds:.1f}x)")
+    print(f"fidelity      : mean abs error {errors.mean():.3f}, max abs error {max_errors.max()}, "
+          f"min PSNR {psnrs.min():.2f} dB, median PSNR {np.median(psnrs):.2f} dB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare reduced JPEG decoding with the full decode + resize")
+    parser.add_argument("--images", nargs="*", help="scenario directories; the train scenario by default")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N generated frames instead")
+    parser.add_argument("--native-height", type=int, default=3000)
+    parser.add_argument("--native-width", type=int, default=4000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--orientation", type=int, choices=range(1, 9),
+                        help="give the generated frames DJI-style Exif (this orientation) and XMP segments")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as directory:
+            run(make_synthetic_frames(directory, args.synthetic, (args.native_height, args.native_width),
+                                      orientation=args.orientation),
+                args.repeats)
+    else:
+        directories = args.images or PathLoader('train').load_path()
+        run([os.path.join(directory, filename) for directory in directories
+             for filename in sorted(os.listdir(directory)) if filename.endswith('.JPG')], args.repeats)
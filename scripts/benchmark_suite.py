@@ -0,0 +1,295 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# test_score.py lives in the repository root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from avp_env.dataLoder import ImageLoader, InstructionTokenTable, clear_assets  # noqa: E402
+from avp_env.dataLoder.path import CACHE_DIR  # noqa: E402
+from avp_env.envs import AutonomousParkingEnv  # noqa: E402
+
+TAGS = ["NextWall", "SideRoad", "NearExit", "Sunlight", "Column", "NextDriveWay", "Charging", "Disabled", "Around"]
+SCENARIOS = {"train": "20240518_01", "test": "20240521_01"}
+NUM_POSITIONS = 29
+NUM_LOCATIONS = 6
+MAX_STRING_LENGTH = 64
+
+
+class OfflineTokenizer:
+    """Deterministic word-hash tokenizer standing in for bert-base-uncased when it cannot be downloaded."""
+
+    def __call__(self, texts, max_length, **kwargs):
+        input_ids = []
+        for text in texts:
+            ids = [101] + [1000 + hash_word(word) for word in text.lower().split()][:max_length - 2] + [102]
+            input_ids.append(ids + [0] * (max_length - len(ids)))
+        return {"input_ids": input_ids}
+
+
+def hash_word(word):
+    # Stable across runs, unlike hash()
+    return sum((i + 1) * ord(char) for i, char in enumerate(word)) % 28000
+
+
+def make_fixture(root, num_trajectories, frame_shape, seed=0):
+    """Write a synthetic Vision/commands tree laid out like ../data; returns the directory to run from."""
+    rng = random.Random(seed)
+    for env_type, scan in SCENARIOS.items():
+        scan_dir = os.path.join(root, "data", "Vision", scan)
+        os.makedirs(scan_dir, exist_ok=True)
+        for position in range(1, NUM_POSITIONS + 1):
+            image = np.random.RandomState(position).randint(0, 255, frame_shape, dtype=np.uint8)
+            cv2.imwrite(os.path.join(scan_dir, f"DJI_{position:02d}.JPG"), image)
+
+        slots = []
+        for path_id in range(1, NUM_POSITIONS + 1):
+            for loc_id in range(1, NUM_LOCATIONS + 1):
+                if rng.random() < 0.7:
+                    slot = {tag: rng.randint(0, 1) for tag in TAGS}
+                    slot.update(Occupied=int(rng.random() < 0.3), ParkingID=len(slots) + 1,
+                                PathID=path_id, LocID=loc_id)
+                    slots.append(slot)
+        with open(os.path.join(scan_dir, "parking_slots.json"), "w") as f:
+            json.dump(slots, f)
+
+        trajectories = []
+        for i in range(num_trajectories):
+            slot = rng.choice(slots)
+            tags = {tag: slot[tag] for tag in rng.sample(TAGS[:5], 2)}
+            tags.update(Disabled=slot["Disabled"], Charging=slot["Charging"], Occupied=0)
+            trajectory = {"scan": scan, "instruction": f"park in slot {i} " + " ".join(tags), "tags": tags}
+            if env_type == "train":
+                trajectory.update(path_id=slot["PathID"], ParkingID=slot["ParkingID"], loc_id=slot["LocID"])
+            trajectories.append(trajectory)
+        with open(os.path.join(scan_dir, "Traj.json"), "w") as f:
+            json.dump(trajectories, f)
+
+        commands_dir = os.path.join(root, "data", "commands")
+        os.makedirs(commands_dir, exist_ok=True)
+        command_name = "target_command.json" if env_type == "train" else "test_command.json"
+        with open(os.path.join(commands_dir, command_name), "w") as f:
+            json.dump([{"instruction": t["instruction"], "tags": t["tags"]} for t in trajectories], f)
+
+    work_dir = os.path.join(root, "work")
+    os.makedirs(work_dir, exist_ok=True)
+    return work_dir
+
+
+def summarize(durations, total=None):
+    durations = np.asarray(durations, dtype=np.float64)
+    total = durations.sum() if total is None else total
+    return {
+        "calls": len(durations),
+        "mean_us": durations.mean() * 1e6,
+        "p50_us": np.percentile(durations, 50) * 1e6,
+        "p90_us": np.percentile(durations, 90) * 1e6,
+        "p99_us": np.percentile(durations, 99) * 1e6,
+        "per_sec": len(durations) / total if total > 0 else float("inf"),
+    }
+
+
+def time_calls(function, args_list):
+    durations = []
+    for args in args_list:
+        start_time = time.perf_counter()
+        function(*args)
+        durations.append(time.perf_counter() - start_time)
+    return summarize(durations)
+
+
+def populate_token_cache(tokenizer):
+    # The envs read bert-base-uncased tokens from the content-addressed cache, so fill it offline
+    for env_type, scan in SCENARIOS.items():
+        with open(os.path.join("..", "data", "Vision", scan, "Traj.json")) as f:
+            instructions = [trajectory["instruction"] for trajectory in json.load(f)]
+        InstructionTokenTable(instructions, MAX_STRING_LENGTH, tokenizer=tokenizer)
+
+
+def bench_tokenization(tokenizer, repeats):
+    with open(os.path.join("..", "data", "Vision", SCENARIOS["train"], "Traj.json")) as f:
+        instructions = [trajectory["instruction"] for trajectory in json.load(f)]
+    durations = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        InstructionTokenTable(instructions, MAX_STRING_LENGTH, cache_dir=None, tokenizer=tokenizer)
+        durations.append(time.perf_counter() - start_time)
+    result = summarize(durations)
+    result["instructions"] = len(instructions)
+    return result
+
+
+def bench_loader(repeats):
+    results = {}
+    for name, clear_cache in (("cold", True), ("warm", False)):
+        durations = []
+        for _ in range(repeats):
+            if clear_cache:
+                for filename in os.listdir(CACHE_DIR) if os.path.isdir(CACHE_DIR) else []:
+                    if not filename.startswith("tokens_"):
+                        os.remove(os.path.join(CACHE_DIR, filename))
+            start_time = time.perf_counter()
+            ImageLoader("train", (128, 400, 3), headless=True)
+            durations.append(time.perf_counter() - start_time)
+        results[name] = summarize(durations)
+    return results
+
+
+def bench_env(num_calls, seed):
+    rng = np.random.default_rng(seed)
+    random.seed(seed)
+    clear_assets()
+    start_time = time.perf_counter()
+    env = AutonomousParkingEnv(headless=True)
+    results = {"construct_s": time.perf_counter() - start_time}
+
+    results["reset"] = time_calls(env.reset, [()] * num_calls)
+
+    # Mostly drive forward so episodes have a realistic length
+    actions = np.where(rng.random(num_calls) < 0.1, rng.integers(1, 7, num_calls), 0)
+    env.reset()
+    durations = []
+    for action in actions:
+        start_time = time.perf_counter()
+        _, _, done, _ = env.step(int(action))
+        durations.append(time.perf_counter() - start_time)
+        if done:
+            env.reset()
+    results["step"] = summarize(durations)
+
+    locations = [(int(loc_id), int(path_id)) for loc_id, path_id in
+                 zip(rng.integers(1, NUM_LOCATIONS + 1, num_calls), rng.integers(1, NUM_POSITIONS + 1, num_calls))]
+    results["get_parking_slots"] = time_calls(env.get_parking_slots, locations)
+    slot_lists = [(env.get_parking_slots(*location),) for location in locations]
+    results["get_reward"] = time_calls(env.get_reward, slot_lists)
+    return results
+
+
+def bench_scoring(num_experiments, seed):
+    import test_score
+
+    rng = random.Random(seed)
+    with open(os.path.join("..", "data", "commands", "test_command.json")) as f:
+        num_instructions = len(json.load(f))
+    with open(os.path.join("..", "data", "Vision", SCENARIOS["test"], "parking_slots.json")) as f:
+        parking_ids = [slot["ParkingID"] for slot in json.load(f)]
+    results = [(SCENARIOS["test"], rng.randrange(num_instructions), rng.choice(parking_ids + [[]]))
+               for _ in range(num_experiments)]
+
+    # test_score reads ./data/Vision, relative to the fixture root
+    cwd = os.getcwd()
+    os.chdir("..")
+    try:
+        test_score.scenario_cache.clear()
+        start_time = time.perf_counter()
+        experiments = [test_score.find_metric_data(*result) for result in results]
+        find_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        test_score.get_parking_metrics(experiments)
+        metrics_seconds = time.perf_counter() - start_time
+    finally:
+        os.chdir(cwd)
+    return {
+        "experiments": num_experiments,
+        "find_metric_data_s": find_seconds,
+        "find_metric_data_per_sec": num_experiments / find_seconds,
+        "get_parking_metrics_s": metrics_seconds,
+        "get_parking_metrics_per_sec": num_experiments / metrics_seconds,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, prefix=""):
+    """Print current/baseline ratios of every shared numeric result."""
+    for key, value in current.items():
+        other = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            compare(other or {}, value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and isinstance(other, (int, float)) and other:
+            print(f"{prefix}{key:40s} {other:14.3f} -> {value:14.3f} ({value / other:6.2f}x)")
+
+
+def run(args):
+    tokenizer = OfflineTokenizer()
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    with tempfile.TemporaryDirectory() as root:
+        cwd = os.getcwd()
+        os.chdir(make_fixture(root, args.trajectories, (args.frame_height, args.frame_width, 3), args.seed))
+        try:
+            populate_token_cache(tokenizer)
+            results = {
+                "tokenization": bench_tokenization(tokenizer, args.repeats),
+                "image_loader": bench_loader(args.repeats),
+                "env": bench_env(args.calls, args.seed),
+                "scoring": bench_scoring(args.experiments, args.seed),
+            }
+        finally:
+            os.chdir(cwd)
+            clear_assets()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "fixture": {
+                "trajectories": args.trajectories,
+                "frame_shape": [args.frame_height, args.frame_width, 3],
+                "tokenizer": args.tokenizer or "offline",
+            },
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark env, loader and scoring hot paths on a synthetic fixture")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--tokenizer", help="local tokenizer directory; a built-in offline tokenizer by default")
+    parser.add_argument("--trajectories", type=int, default=200)
+    parser.add_argument("--frame-height", type=int, default=1080)
+    parser.add_argument("--frame-width", type=int, default=1920)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--experiments", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Loader progress goes to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"save benchmark report as {args.output}")
+    else:
+        print(json.dumps(report, indent=4))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f)["results"], report["results"])
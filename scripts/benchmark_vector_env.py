@@ -0,0 +1,57 @@
+import random
+import time
+
+import numpy as np
+
+from avp_env.envs import AutonomousParkingEnv, AutonomousParkingVectorEnv
+
+
+def random_actions(rng, num_envs, park_probability=0.1):
+    # Mostly drive forward so episodes have a realistic length
+    return np.where(rng.random(num_envs) < park_probability, rng.integers(1, 7, num_envs), 0)
+
+
+def benchmark_independent_envs(num_envs, num_steps, seed=0):
+    rng = np.random.default_rng(seed)
+    random.seed(seed)
+    envs = [AutonomousParkingEnv(headless=True) for _ in range(num_envs)]
+    for env in envs:
+        env.reset()
+
+    start_time = time.perf_counter()
+    for _ in range(num_steps):
+        actions = random_actions(rng, num_envs)
+        observations = []
+        for env, action in zip(envs, actions):
+            observation, _, done, _ = env.step(int(action))
+            if done:
+                observation = env.reset()
+            observations.append(observation)
+        # A batched policy needs the observations stacked, as a generic sync vector env would do
+        np.stack([image for image, _ in observations])
+        np.stack([instruction for _, instruction in observations])
+    elapsed = time.perf_counter() - start_time
+    return num_envs * num_steps / elapsed
+
+
+def benchmark_vector_env(num_envs, num_steps, seed=0):
+    rng = np.random.default_rng(seed)
+    env = AutonomousParkingVectorEnv(num_envs, seed=seed, copy=False)
+    env.reset()
+
+    start_time = time.perf_counter()
+    for _ in range(num_steps):
+        env.step(random_actions(rng, num_envs))
+    elapsed = time.perf_counter() - start_time
+    return num_envs * num_steps / elapsed
+
+
+if __name__ == "__main__":
+    num_steps = 200
+    for num_envs in [1, 8, 64, 256]:
+        independent_sps = benchmark_independent_envs(num_envs, num_steps)
+        vector_sps = benchmark_vector_env(num_envs, num_steps)
+        print(
+            f"N={num_envs:4d} | independent envs: {independent_sps:12.1f} steps/s | "
+            f"vector env: {vector_sps:12.1f} steps/s | speedup: {vector_sps / independent_sps:6.1f}x"
+        )
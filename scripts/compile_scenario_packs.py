@@ -0,0 +1,33 @@
+import argparse
+import json
+import os
+
+from avp_env.common.scenario_pack import compile_commands, compile_scenario
+from avp_env.dataLoder.path import PathLoader
+from avp_env.dataLoder.tokens import InstructionTokenTable
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile Vision scenario directories into scenario_pack.npz files")
+    parser.add_argument("scenarios", nargs="*",
+                        help="scenario directories; the train and test scenarios by default")
+    parser.add_argument("--max-string-length", type=int, default=64)
+    parser.add_argument("--no-tokens", action="store_true", help="do not store pre-tokenized instructions")
+    parser.add_argument("--commands-dir", default="../data/commands",
+                        help="directory whose target/test command files are compiled too")
+    parser.add_argument("--no-commands", action="store_true", help="do not compile the command files")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios or PathLoader('train').load_path() + PathLoader('test').load_path()
+    for experiment_path in scenarios:
+        token_table = None
+        if not args.no_tokens:
+            with open(os.path.join(experiment_path, 'Traj.json'), 'r') as f:
+                instructions = [trajectory['instruction'] for trajectory in json.load(f)]
+            token_table = InstructionTokenTable(instructions, args.max_string_length)
+        print(f"save {compile_scenario(experiment_path, token_table)}")
+
+    if not args.no_commands:
+        for command_name in ('target_command.json', 'test_command.json'):
+            commands_path = os.path.join(args.commands_dir, command_name)
+            if os.path.exists(commands_path):
+                print(f"save {compile_commands(commands_path)}")
@@ -2,9 +2,10 @@ import json
 # import numpy as np
 import os
 import zipfile
+from functools import partial
 
 from avp_env.agents.rule import RulebasedAgent
-from avp_env.envs.avp_env import MetricsEnv
+from avp_env.envs.evaluation import EvaluationRunner
 
 
 def get_result_id(env, agent, instructions_index=None):
@@ -56,17 +57,18 @@ def instru_len(instru_path):
 
 
 if __name__ == "__main__":
-    # 创建 AutonomousParkingEnv 环境实例
-    env = MetricsEnv()
-
     is_optimal = False
     is_random = True
-    agent = RulebasedAgent(is_optimal, is_random)
+    # 并行评估的进程数，设为 1 则在当前进程中逐条运行
+    num_workers = os.cpu_count()
 
     instruction_path = '../data/commands/test_command.json'
     instruction_num = instru_len(instruction_path)
 
-    experiments = get_experiment(env, agent, instruction_num)
+    # 每个进程各自创建 MetricsEnv 与智能体；自定义智能体时需传入可 pickle 的工厂函数
+    agent_factory = partial(RulebasedAgent, is_optimal, is_random)
+    runner = EvaluationRunner(agent_factory, num_workers=num_workers, episode_fn=get_result_id)
+    experiments = runner.run(instruction_num)
 
     # save experiments as JSON
     json_filename = '../result/test_results.json'
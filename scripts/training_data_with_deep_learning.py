@@ -1,19 +1,16 @@
-import h5py
-import numpy as np
 # import pandas as pd
 
 from avp_env.agents.rule import RulebasedAgent
 from avp_env.envs import AutonomousParkingEnv
+from avp_env.utils.dataset import ReferenceDatasetWriter, SupervisedDatasetWriter
 
 
-def collect_data_for_supervised_learning(env, agent, num_episodes=100):
+def collect_data_for_supervised_learning(env, agent, writer, num_episodes=100):
     """
-    Collecting data using Agents in the environment, suitable for supervised learning
+    Collecting data using Agents in the environment, suitable for supervised learning.
+    Samples are streamed into the writer; a resumed writer continues after its last finished episode.
     """
-    images = []
-    instructions = []
-    actions = []
-    for _ in range(num_episodes):
+    for _ in range(writer.episodes, num_episodes):
         obs = env.reset()
         perfect_trajectory = env.get_perfect_traj()
         for i in range(len(perfect_trajectory)):
@@ -23,14 +20,36 @@ def collect_data_for_supervised_learning(env, agent, num_episodes=100):
 
             next_obs, _, done, info = env.step(action)
             if i != 0:
-                images.append(image)  # Flatten the image for easier storage
-                instructions.append(instruction)
-                actions.append(action)
+                writer.append(image, instruction, action)
 
             obs = next_obs
             if done:
                 break
-    return np.array(images), np.array(instructions), np.array(actions)
+        writer.end_episode()
+    return writer
+
+
+def collect_reference_data_for_supervised_learning(env, agent, writer, num_episodes=100):
+    """
+    Same samples as collect_data_for_supervised_learning, stored as references to deduplicated
+    frames and instructions (see ReferenceDatasetWriter)
+    """
+    for _ in range(num_episodes):
+        env.reset()
+        perfect_trajectory = env.get_perfect_traj()
+        for i in range(len(perfect_trajectory)):
+            # Row of the frame in the current observation, taken before step may refresh it
+            image_row = env.render_row
+            current_position = env.get_position()
+            action = agent.get_action(perfect_trajectory, current_position)
+
+            _, _, done, info = env.step(action)
+            if i != 0:
+                writer.append(image_row, env.target_index, action)
+
+            if done:
+                break
+    return writer
 
 
 # Creating an Instance of the AutonomousParkingEnv Environment
@@ -40,11 +59,18 @@ isRandom = False
 
 agent = RulebasedAgent(is_optimal=isOptimal, is_random=isRandom)
 
-# Collection of data
-images, instructions, actions = collect_data_for_supervised_learning(env, agent, num_episodes=1000)
+# Deduplicated export: each distinct frame and instruction is written once and samples reference them.
+# Load it with avp_env.utils.dataset.ReferenceDataset
+deduplicate = False
 
-# Save the dataset as HDF5 files
-with h5py.File(f'New_Supervised_Opt_{isOptimal}_Ran_{isRandom}_dataset.h5', 'w') as f:
-    f.create_dataset('images', data=images)
-    f.create_dataset('instructions', data=instructions)
-    f.create_dataset('actions', data=actions)
+if deduplicate:
+    dataset_path = f'New_Supervised_Opt_{isOptimal}_Ran_{isRandom}_reference_dataset.h5'
+    with ReferenceDatasetWriter(dataset_path, env.image_data, env.instruction_tokens.tokens) as dataset_writer:
+        collect_reference_data_for_supervised_learning(env, agent, dataset_writer, num_episodes=1000)
+else:
+    # Collection of data, streamed into the HDF5 file in fixed-size batches
+    # Set resume=True to continue an interrupted collection into the same file
+    dataset_path = f'New_Supervised_Opt_{isOptimal}_Ran_{isRandom}_dataset.h5'
+    with SupervisedDatasetWriter(dataset_path, env.image_shape, env.max_string_length,
+                                 batch_size=1024, compression=None, resume=False) as dataset_writer:
+        collect_data_for_supervised_learning(env, agent, dataset_writer, num_episodes=1000)
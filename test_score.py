@@ -1,6 +1,13 @@
+import argparse
 import json
+import time
 from typing import Any, Dict, List
 
+import numpy as np
+
+from avp_env.common.scenario_pack import load_pack
+from avp_env.common.tag_index import TagIndex
+
 
 MAX_DISTANCE = 87
 
@@ -21,13 +28,141 @@ def get_parking_metrics(experiments: List[Dict[str, Any]]):
                 }, ...
             ]
     """
-    ne_metrics = calc_navigation_errors(experiments)             # 导航错误率
-    sr_metrics = calc_success_rate(experiments)                  # 成功率
-    dwsr_metrics = calc_weighted_success_rate(experiments)       # 距离加权成功率
-    ape_metrics = calc_absolute_parking_slot_error(experiments)  # 绝对停车位误差
-    mr_metrics = calc_miss_rate(experiments)                     # 错失率
-    psmd_metrics = calc_matching_rate(experiments)               # 车位匹配度
-    return ne_metrics, sr_metrics, dwsr_metrics, ape_metrics, mr_metrics, psmd_metrics
+    # 六项指标由同一个向量化内核一次算出，结果与下方逐项的 calc_* 函数逐位一致
+    return calc_packed_metrics(pack_experiments(experiments))
+
+
+def _sequential_sum(values, start=0):
+    """从 start 开始按顺序逐个累加（与 Python 循环中的 += 完全相同的舍入），而不是 np.sum 的成对求和"""
+    if not len(values):
+        return start
+    return float(np.cumsum(np.concatenate(([start], values)), dtype=np.float64)[-1])
+
+
+def pack_experiments(experiments):
+    """把实验列表一次性打包成 NumPy 数组，不等长的目标距离用 offsets 表示"""
+    has_target_features = []
+    success = []
+    occupied = []
+    result_distances = []
+    target_distances = []
+    target_counts = []
+    matching_rows = []
+    matching_tags = []
+    total_tags = []
+
+    for i, experiment in enumerate(experiments):
+        result_id = experiment["result_id"]
+        target_features = experiment["target_features"]
+        result_features = experiment["result_features"]
+        result_tags = result_features.get('tags')
+
+        has_target_features.append(bool(target_features))
+        success.append(bool(result_id and result_id in experiment["target_id"]))
+        # 与 calc_navigation_errors 相同：有目标车位时读取决策车位的 Occupied（没有决策车位时同样抛出 TypeError）
+        occupied.append(bool(target_features) and result_features['tags']["Occupied"] != 0)
+        result_distances.append(result_features["distance"])
+        target_distances.extend(target["distance"] for target in target_features)
+        target_counts.append(len(target_features))
+
+        if target_features and result_id:
+            target_tags = target_features[0]['tags']
+            if result_tags and target_tags:
+                # 标签值可以是任意 JSON 值，逐个标签的相等比较在打包时完成，只保留计数
+                matching_rows.append(i)
+                matching_tags.append(sum(result_tags.get(tag) == value for tag, value in target_tags.items()))
+                total_tags.append(len(target_tags))
+
+    return {
+        "has_target_features": np.array(has_target_features, dtype=bool),
+        "success": np.array(success, dtype=bool),
+        "occupied": np.array(occupied, dtype=bool),
+        "result_distances": np.array(result_distances),
+        "target_distances": np.array(target_distances),
+        "target_offsets": np.concatenate(([0], np.cumsum(target_counts, dtype=np.int64))),
+        "matching_rows": np.array(matching_rows, dtype=np.int64),
+        "matching_tags": np.array(matching_tags, dtype=np.int64),
+        "total_tags": np.array(total_tags, dtype=np.int64),
+    }
+
+
+def calc_packed_metrics(packed):
+    """单次遍历打包后的数组计算全部六项指标"""
+    return metrics_from_sums(calc_packed_sums(packed), len(packed["success"]))
+
+
+def calc_packed_sums(packed, sums=(0, 0, 0, 0, 0, 0)):
+    """六项指标除以实验总数之前的计数与累加和；sums 为之前各块的结果，按实验顺序继续累加"""
+    ne_count, sr_count, dwsr_sum, ape_sum, mr_sum, psmd_sum = sums
+    total_experiments = len(packed["success"])
+    result_distances = packed["result_distances"]
+    target_distances = packed["target_distances"]
+    offsets = packed["target_offsets"]
+    target_counts = np.diff(offsets)
+    has_targets = target_counts > 0
+    has_result_distance = result_distances != 0
+
+    # 导航错误率 / 成功率 / 距离加权成功率
+    ne_count += int(np.count_nonzero(packed["has_target_features"] & packed["occupied"]))
+    sr_count += int(np.count_nonzero(packed["success"]))
+    success_distances = result_distances[packed["success"]]
+    weighted = np.zeros(total_experiments, dtype=np.float64)
+    weighted[packed["success"]] = 1 / success_distances
+    dwsr_sum = _sequential_sum(weighted, dwsr_sum)
+
+    # 每个目标车位对应的决策车位距离
+    target_owner = np.repeat(np.arange(total_experiments), target_counts)
+    owner_result = result_distances[target_owner]
+    owner_has_result = has_result_distance[target_owner]
+    segments = offsets[:-1][has_targets]
+
+    # 绝对停车位误差：对每个实验的目标车位取最小误差
+    min_distance = np.zeros(total_experiments, dtype=np.float64)
+    target_errors = np.where(
+        owner_has_result,
+        np.abs((owner_result - target_distances) / MAX_DISTANCE),
+        np.abs((MAX_DISTANCE - target_distances) / MAX_DISTANCE)
+    )
+    if len(segments):
+        min_distance[has_targets] = np.minimum.reduceat(target_errors, segments)
+    result_only = ~has_targets & has_result_distance
+    min_distance[result_only] = np.minimum(
+        np.abs((MAX_DISTANCE - result_distances[result_only]) / MAX_DISTANCE),
+        np.abs(result_distances[result_only] / MAX_DISTANCE)
+    )
+    ape_sum = _sequential_sum(min_distance, ape_sum)
+
+    # 错失率：决策车位之前的目标车位比例
+    equivalent_miss = np.zeros(total_experiments, dtype=np.float64)
+    if len(segments):
+        targets_before_result = np.add.reduceat((target_distances < owner_result).astype(np.int64), segments)
+        missable = has_result_distance[has_targets]
+        miss = np.zeros(len(segments), dtype=np.float64)
+        miss[missable] = targets_before_result[missable] / target_counts[has_targets][missable]
+        equivalent_miss[has_targets] = miss
+    mr_sum = _sequential_sum(equivalent_miss, mr_sum)
+
+    # 车位匹配度
+    matching_tags = packed["matching_tags"]
+    total_tags = packed["total_tags"]
+    matching_score = np.zeros(total_experiments, dtype=np.float64)
+    matching_score[packed["matching_rows"]] = np.where(total_tags > 0, matching_tags / np.maximum(total_tags, 1), 0)
+    psmd_sum = _sequential_sum(matching_score, psmd_sum)
+
+    return ne_count, sr_count, dwsr_sum, ape_sum, mr_sum, psmd_sum
+
+
+def metrics_from_sums(sums, total_experiments):
+    """计数与累加和除以实验总数，得到与 get_parking_metrics 相同顺序的六项指标"""
+    ne_count, sr_count, dwsr_sum, ape_sum, mr_sum, psmd_sum = sums
+    return (
+        ne_count / total_experiments,
+        sr_count / total_experiments,
+        dwsr_sum / total_experiments,
+        ape_sum / total_experiments,
+        mr_sum / total_experiments if total_experiments > 0 else 0,
+        psmd_sum / total_experiments if total_experiments > 0 else 0,
+    )
 
 
 def calc_navigation_errors(experiments):
@@ -196,6 +331,45 @@ def calc_matching_rate(experiments):
     return weighted_matching_rate
 
 
+class ParkingMetricsAccumulator:
+    """分块累加的指标计算：每 chunk_size 条实验用 pack_experiments/calc_packed_sums 处理一次，
+    只保留各项计数与累加和，内存占用恒定，最终结果与批量计算完全一致"""
+
+    def __init__(self, chunk_size=4096):
+        self.chunk_size = chunk_size
+        self.total_experiments = 0
+        self.sums = (0, 0, 0, 0, 0, 0)
+        self.pending = []
+
+    def update(self, experiment):
+        self.pending.append(experiment)
+        self.total_experiments += 1
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.sums = calc_packed_sums(pack_experiments(self.pending), self.sums)
+            self.pending = []
+
+    def result(self):
+        """与 get_parking_metrics 相同顺序的六项指标"""
+        self.flush()
+        return metrics_from_sums(self.sums, self.total_experiments)
+
+
+def weighted_score(ne_metrics, sr_metrics, dwsr_metrics, ape_metrics, mr_metrics, psmd_metrics):
+    """加权计算最终得分（权值可调整）"""
+    return (
+        - 10 * ne_metrics
+        + 50 * sr_metrics
+        + 100 * dwsr_metrics
+        - 10 * ape_metrics
+        - 5 * mr_metrics
+        + 40 * psmd_metrics
+    )
+
+
 def find_metric_data(test_scenario_id, test_instruction_id, vlp_decision_position_id):
     """根据测试场景 ID、测试指令 ID 和 VLP 决策车位 ID 查找实验数据"""
     # result_id 就是 vlp_decision_position_id
@@ -218,31 +392,120 @@ def find_metric_data(test_scenario_id, test_instruction_id, vlp_decision_positio
     return experiment
 
 
+VISION_DIR = './data/Vision'
+
+
+def slot_features(item):
+    """由 parking_slots.json 中的一个车位生成特征（距离预先计算）"""
+    return {
+        "distance": (item['PathID'] - 1) * 3 + (item['LocID'] - 1) % 3 + 1,
+        "tags": {
+            "NextWall": item['NextWall'],
+            "SideRoad": item['SideRoad'],
+            "NearExit": item['NearExit'],
+            "Sunlight": item['Sunlight'],
+            "Column": item['Column'],
+            "NextDriveWay": item['NextDriveWay'],
+            "Charging": item['Charging'],
+            "Disabled": item['Disabled'],
+            "Occupied": item['Occupied'],
+            "Around": item['Around'],
+        },
+    }
+
+
+class Scenario:
+    """一个测试场景：parking_slots.json 与 Traj.json 各只解析一次，并建立 ParkingID -> 特征 的索引"""
+
+    def __init__(self, scenario_dir):
+        self.scenario_dir = scenario_dir
+        self._parking_slots = None
+        self._parking_commands = None
+        self._features_by_id = None
+        self._tag_index = None
+        self._target_ids = {}
+
+    @property
+    def parking_slots(self):
+        if self._parking_slots is None:
+            # 优先读取编译好的场景包，内容与 JSON 完全一致
+            pack = load_pack(self.scenario_dir)
+            if pack is not None:
+                self._parking_slots = pack.parking_slots()
+            else:
+                with open(f'{self.scenario_dir}/parking_slots.json', 'r') as f:
+                    self._parking_slots = json.load(f)
+        return self._parking_slots
+
+    @property
+    def parking_commands(self):
+        if self._parking_commands is None:
+            pack = load_pack(self.scenario_dir)
+            if pack is not None:
+                self._parking_commands = pack.trajectories()
+            else:
+                with open(f'{self.scenario_dir}/Traj.json', 'r') as f:
+                    self._parking_commands = json.load(f)
+        return self._parking_commands
+
+    @property
+    def features_by_id(self):
+        if self._features_by_id is None:
+            features_by_id = {}
+            for item in self.parking_slots:
+                # 与逐个查找时一致：重复的 ParkingID 以第一个为准
+                if item['ParkingID'] not in features_by_id:
+                    features_by_id[item['ParkingID']] = slot_features(item)
+            self._features_by_id = features_by_id
+        return self._features_by_id
+
+    @property
+    def tag_index(self):
+        if self._tag_index is None:
+            self._tag_index = TagIndex(self.parking_slots)
+        return self._tag_index
+
+    def target_ids(self, test_instruction_id):
+        """返回符合该指令标签的全部 ParkingID（按指令缓存）"""
+        if test_instruction_id not in self._target_ids:
+            target_command = self.parking_commands[test_instruction_id]
+            match_tags = target_command.get('tags', {})  # 获取指令的标签
+
+            # 筛选符合条件的停车位：对每个 (tag, value) 的车位位图求交集
+            matching_slots = [slot['ParkingID'] for slot in self.tag_index.match(match_tags)]
+            self._target_ids[test_instruction_id] = matching_slots
+        return self._target_ids[test_instruction_id]
+
+
+class ScenarioCache:
+    """按场景 ID 缓存 Scenario，评分时每个场景的文件只读取一次"""
+
+    def __init__(self, vision_dir=VISION_DIR):
+        self.vision_dir = vision_dir
+        self._scenarios = {}
+
+    def get(self, test_scenario_id):
+        scenario = self._scenarios.get(test_scenario_id)
+        if scenario is None:
+            scenario = Scenario(f'{self.vision_dir}/{test_scenario_id}')
+            self._scenarios[test_scenario_id] = scenario
+        return scenario
+
+    def clear(self):
+        self._scenarios.clear()
+
+
+scenario_cache = ScenarioCache()
+
+
 def get_features_by_id(test_scenario_id, parking_id):
-    """根据（实验结果 / 测试集中的）PID 获取相应的特征"""
+    """根据（实验结果 / 测试集中的）PID 获取相应的特征
+
+    返回的特征字典在同一场景的所有调用间共享，调用方不应修改
+    """
     features = {}
     if parking_id:
-        with open(f'./data/Vision/{test_scenario_id}/parking_slots.json', 'r') as f:
-            parking_slots = json.load(f)
-
-        for item in parking_slots:
-            if item['ParkingID'] == parking_id:
-                features = {
-                    "distance": (item['PathID'] - 1) * 3 + (item['LocID'] - 1) % 3 + 1,
-                    "tags": {
-                        "NextWall": item['NextWall'],
-                        "SideRoad": item['SideRoad'],
-                        "NearExit": item['NearExit'],
-                        "Sunlight": item['Sunlight'],
-                        "Column": item['Column'],
-                        "NextDriveWay": item['NextDriveWay'],
-                        "Charging": item['Charging'],
-                        "Disabled": item['Disabled'],
-                        "Occupied": item['Occupied'],
-                        "Around": item['Around'],
-                    },
-                }
-                break
+        features = scenario_cache.get(test_scenario_id).features_by_id.get(parking_id, {})
     else:
         features = {
             "distance": MAX_DISTANCE,
@@ -269,79 +532,87 @@ def meets_criteria(slot, tags):
 
 # 示例辅助函数，用于获取 target_id 和 target_features
 def get_target_id(test_scenario_id, test_instruction_id):
-    # with open(f'./data/Vision/{test_scenario_id}/parking_slots.json', 'r') as f:
-    #     parking_slots = json.load(f)
-    #
-    # with open(f'./data/Vision/{test_scenario_id}/Traj.json', 'r') as f:
-    #     parking_commands = json.load(f)
-    #
-    # with open(f'./data/Vision/{test_scenario_id}/Traj_withinfo.json', 'r') as f:
-    #     parking_commands_withinfo = json.load(f)
-    #
-    # test_instruction = parking_commands[test_instruction_id]['instruction']
-    # match_tags = None
-    # for item in parking_commands_withinfo:
-    #     if item['instruction'] == test_instruction:
-    #         match_tags = item['tags']
-    #         break
-    # if match_tags:
-    #     matching_slots = [
-    #         slot['ParkingID']
-    #         for slot in parking_slots
-    #         if meets_criteria(slot, match_tags)
-    #     ]
-    # else:
-    #     matching_slots = []
-    # return matching_slots
-
-    with open(f'./data/Vision/{test_scenario_id}/parking_slots.json', 'r') as f:
-        parking_slots = json.load(f)
-
-    with open(f'./data/Vision/{test_scenario_id}/Traj.json', 'r') as f:
-        parking_commands = json.load(f)
-
     # 直接通过 test_instruction_id 获取指令和标签
     try:
-        target_command = parking_commands[test_instruction_id]
+        return scenario_cache.get(test_scenario_id).target_ids(test_instruction_id)
     except IndexError:
         print(f"Error: test_instruction_id {test_instruction_id} is out of range.")
         return []
 
-    test_instruction = target_command['instruction']
-    match_tags = target_command.get('tags', {})  # 获取指令的标签
 
-    # 筛选符合条件的停车位
-    if match_tags:
-        matching_slots = [
-            slot['ParkingID']
-            for slot in parking_slots
-            if all(slot.get(key) == value for key, value in match_tags.items())
-        ]
-    else:
-        matching_slots = []
+def _read_more(file, follow, poll_interval, chunk_size):
+    """读取下一块数据；follow 模式下文件暂时读完时等待写入方继续写"""
+    while True:
+        chunk = file.read(chunk_size)
+        if chunk or not follow:
+            return chunk
+        time.sleep(poll_interval)
 
-    return matching_slots
 
+def iter_results(results_path, follow=False, poll_interval=1.0, chunk_size=1 << 16):
+    """逐条读取结果文件，支持 JSON Lines 与 JSON 数组两种格式，不会一次性载入整个文件
 
-if __name__ == '__main__':
-    # 获取测试结果数据
-    with open('result/test_results.json', 'r') as file:
-        context_data = json.load(file)
-    # 获取传递的信息
-    experiments = []
-    for item in context_data:
-        test_scenario_id = item.get("TestScenarioID")
-        test_instruction_id = item.get("TestInstructionID")
-        vlp_decision_position_id = item.get("VLPDecisionPositionID")
-
-        experiment = find_metric_data(test_scenario_id, test_instruction_id, vlp_decision_position_id)
-        experiments.append(experiment)
-
-    # 分别计算各项指标
-    NE_Metrics, SR_Metrics, DWSR_Metrics, APE_Metrics, MR_Metrics, PSMD_Metrics \
-        = get_parking_metrics(experiments)
+    follow=True 时像 tail -f 一样等待正在写入的文件：JSON 数组在读到 ']' 时结束，JSON Lines 需手动中断。
+    """
+    decoder = json.JSONDecoder()
+    with open(results_path, 'r') as file:
+        buffer = ''
+        while not buffer.strip():
+            chunk = _read_more(file, follow, poll_interval, chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+        buffer = buffer.lstrip()
+
+        if not buffer.startswith('['):
+            # JSON Lines：每行一个结果，最后一行可能尚未写完
+            while True:
+                lines = buffer.split('\n')
+                buffer = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+                chunk = _read_more(file, follow, poll_interval, chunk_size)
+                if not chunk:
+                    break
+                buffer += chunk
+            if buffer.strip():
+                yield json.loads(buffer)
+            return
+
+        # JSON 数组：逐个解析数组元素
+        position = 1
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = _read_more(file, follow, poll_interval, chunk_size)
+                if not chunk:
+                    raise
+                # 丢弃已解析的部分，避免缓冲区无限增长
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item
+            position = end
+
+
+def result_to_experiment(item):
+    return find_metric_data(
+        item.get("TestScenarioID"),
+        item.get("TestInstructionID"),
+        item.get("VLPDecisionPositionID")
+    )
+
+
+def print_metrics(metrics, prefix=""):
+    NE_Metrics, SR_Metrics, DWSR_Metrics, APE_Metrics, MR_Metrics, PSMD_Metrics = metrics
     print(
-        "Navigation Error Metrics:", NE_Metrics,
+        prefix + "Navigation Error Metrics:", NE_Metrics,
         "Success Rate Metrics:", SR_Metrics,
         "Distance Weighted Success Rate Metrics:", DWSR_Metrics,
         "Absolute Parking Slot Error Metrics:", APE_Metrics,
@@ -349,13 +620,41 @@ if __name__ == '__main__':
         "Parking Slot Matching Degree Metrics:", PSMD_Metrics
     )
 
+
+def stream_score(results_path, report_every=0, follow=False, poll_interval=1.0):
+    """流式评分：逐条累加指标，每 report_every 条输出一次中间得分"""
+    accumulator = ParkingMetricsAccumulator()
+    try:
+        for item in iter_results(results_path, follow, poll_interval):
+            accumulator.update(result_to_experiment(item))
+            if report_every and accumulator.total_experiments % report_every == 0:
+                metrics = accumulator.result()
+                print_metrics(metrics, prefix=f"[{accumulator.total_experiments}] ")
+                print(weighted_score(*metrics))
+    except KeyboardInterrupt:
+        # follow 模式下中断时仍然输出已读取部分的得分
+        pass
+    return accumulator.result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="计算测试结果的各项指标与加权得分")
+    parser.add_argument('--results', default='result/test_results.json',
+                        help="结果文件（JSON 数组或 JSON Lines）")
+    parser.add_argument('--stream', action='store_true', help="逐条读取并累加，内存占用恒定")
+    parser.add_argument('--every', type=int, default=0, help="流式模式下每 N 条输出一次中间得分")
+    parser.add_argument('--follow', action='store_true', help="流式模式下等待仍在写入的结果文件")
+    args = parser.parse_args()
+
+    if args.stream or args.follow:
+        metrics = stream_score(args.results, args.every, args.follow)
+    else:
+        # 获取传递的信息
+        experiments = [result_to_experiment(item) for item in iter_results(args.results)]
+        # 分别计算各项指标
+        metrics = get_parking_metrics(experiments)
+    print_metrics(metrics)
+
     # 加权计算（权值可调整）
-    mse_result = (
-        - 10 * NE_Metrics
-        + 50 * SR_Metrics
-        + 100 * DWSR_Metrics
-        - 10 * APE_Metrics
-        - 5 * MR_Metrics
-        + 40 * PSMD_Metrics
-    )
+    mse_result = weighted_score(*metrics)
     print(mse_result)